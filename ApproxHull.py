@@ -0,0 +1,131 @@
+import numpy as np
+
+import helpers
+from RandomIncHull import RandomIncrementalHull3D
+
+def approximate_hull(points, epsilon = 0.01, method = 'directions', engine = RandomIncrementalHull3D, exact_error = False,
+                     block = 65536, **kwargs):
+    """
+    Builds an approximate hull, the exact hull of a small coreset of the points picked in one vectorized pass over them.
+    The hull is within epsilon times the diagonal of the bounding box of the exact hull, and its hausdorff_error is set
+    to a bound on the distance between the two, so the time after the pass depends on epsilon and not on the number of points.
+    - 'directions' keeps the extreme point along about 4 / epsilon directions spread over the sphere. Every point is inside
+      the planes of those extremes, so the error is at most the distance from the corners of the polytope the planes
+      bound to the hull (see support_vertices), which is what hausdorff_error holds. While that bound is over epsilon
+      times the diagonal the number of directions is doubled and the pass done again.
+    - 'grid' keeps the lowest and highest point of every column of a grid across the two shortest axes of the bounding
+      box, with cells of side epsilon * diagonal / sqrt(2). Every point is in a column, within one cell diagonal of
+      the segment between its two extremes, which is the bound hausdorff_error holds. The bounding box takes one more
+      pass, but each point costs a sort of its block instead of a projection on every direction.
+
+    Args:
+        points (np.ndarray): The (N,3) points, can be memory mapped
+        epsilon (float, optional): The error allowed, relative to the diagonal of the bounding box. Defaults to 0.01.
+        method (str, optional): How the coreset is picked, 'directions' or 'grid'. Defaults to 'directions'.
+        engine (type, optional): The hull class the coreset is built with. Defaults to RandomIncrementalHull3D.
+        exact_error (bool, optional): A flag to measure the error on every point instead of bounding it, one more pass
+            that tests every point against the hull. Defaults to False.
+        block (int, optional): The number of points read at a time. Defaults to 65536.
+        **kwargs: Options passed to the engine (dcel, prefilter, ...)
+
+    Raises:
+        ValueError: epsilon is not positive, or an unknown method
+
+    Returns:
+        RandomIncrementalHull3D: the hull of the coreset, its input_indices refer to the rows of points and its
+        hausdorff_error is a bound on how far the exact hull reaches past it
+    """
+    if not epsilon > 0:
+        raise ValueError(f"epsilon must be positive, not {epsilon}.")
+    if method not in ('directions', 'grid'):
+        raise ValueError(f"Unknown coreset method {method!r}, use 'directions' or 'grid'.")
+    points = np.asarray(points).reshape(-1, 3)
+
+    if method == 'directions':
+        count = int(np.ceil(4 / epsilon))
+        while True: ## more directions until the certified bound is within epsilon, usually the first try
+            directions = np.concatenate((helpers.sphere_directions(count), helpers.FILTER_DIRECTIONS))
+            coreset = helpers.extreme_points(points, directions, block)
+            extremes = np.asarray(points[coreset], dtype=np.float64)
+            diagonal = np.linalg.norm(np.ptp(extremes, axis=0)) ## the axes are among the directions, so this is the box of points
+            witnesses = support_vertices(directions, (extremes @ directions.T).max(axis=0), extremes.mean(axis=0))
+            hull, corners = _coreset_hull(points, coreset, engine, kwargs)
+            if witnesses is None: ## flat points, the planes don't bound a polytope to measure with
+                hull.hausdorff_error = distance_to_hull(points, corners, block)
+                break
+            hull.hausdorff_error = distance_to_hull(witnesses, corners)
+            if hull.hausdorff_error <= epsilon * diagonal:
+                break
+            count *= 2
+    else:
+        low, high = np.full(3, np.inf), np.full(3, -np.inf)
+        for start in range(0, len(points), block):
+            chunk = np.asarray(points[start:start + block], dtype=np.float64)
+            low, high = np.minimum(low, chunk.min(axis=0, initial=np.inf)), np.maximum(high, chunk.max(axis=0, initial=-np.inf))
+        extent = np.maximum(high - low, 0)
+        cell = max(epsilon * np.linalg.norm(extent) / np.sqrt(2), np.finfo(np.float64).tiny)
+        axis = int(extent.argmax()) ## the fewest columns
+        shape = tuple(int(max(np.ceil(extent[other] / cell), 1)) for other in range(3) if other != axis)
+        coreset = helpers.grid_extremes(points, low, cell, shape, axis, block)[0]
+        hull, corners = _coreset_hull(points, coreset, engine, kwargs)
+        hull.hausdorff_error = cell * np.sqrt(2)
+
+    if exact_error:
+        hull.hausdorff_error = distance_to_hull(points, corners, block)
+    return hull
+
+def _coreset_hull(points, coreset, engine, kwargs):
+    """
+    Builds the hull of the coreset rows of points, with input indices that refer to the rows of points
+
+    Returns:
+        tuple: the hull and the (F,3,3) corners of its triangles
+    """
+    hull = engine(np.asarray(points[coreset], dtype=np.float64), **kwargs)
+    hull.input_indices = coreset[hull.input_indices]
+    hull.points_seen = len(points)
+    vertices, triangles, _ = hull.export_mesh()
+    return hull, vertices[triangles]
+
+def support_vertices(directions, supports, center):
+    """
+    Finds the corners of the polytope bounded by the planes x . directions[i] <= supports[i], as the facets of the
+    hull of the dual points directions[i] / (supports[i] - directions[i] . center) around a center inside it
+
+    Args:
+        directions (np.ndarray): The (D,3) directions, spread over the whole sphere
+        supports (np.ndarray): The (D,) largest projection of the points on each direction
+        center (np.ndarray): The (3,) point strictly inside the planes
+
+    Returns:
+        np.ndarray: the (V,3) corners, or None when the center is on a plane (the points are flat) and there is no dual
+    """
+    gaps = supports - directions @ center
+    scale = np.abs(supports).max(initial=0) + np.abs(center).max(initial=0)
+    if gaps.min() <= 1e-9 * max(scale, np.finfo(np.float64).tiny):
+        return None
+    vertices, triangles, _ = RandomIncrementalHull3D(directions / gaps[:, None]).export_mesh()
+    corners = vertices[triangles]
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    offsets = np.einsum('ij,ij->i', normals, corners[:, 0])
+    return center + normals / offsets[:, None] ## the facet n . d = o of the dual is the corner n / o
+
+def distance_to_hull(points, corners, block = None):
+    """
+    The distance from the farthest point outside a closed triangle mesh to the mesh, 0 when every point is inside.
+    Only the points outside are measured against the triangles
+
+    Args:
+        points (np.ndarray): The (N,3) points, can be memory mapped
+        corners (np.ndarray): The (F,3,3) corners of the triangles, counter clockwise seen from outside
+        block (int, optional): The number of points tested at a time, see helpers.points_outside. Defaults to None.
+
+    Returns:
+        float: the largest distance
+    """
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    offsets = np.einsum('ij,ij->i', normals, corners[:, 0])
+    outside = helpers.points_outside(normals, offsets, points, block=block)
+    if not len(outside):
+        return 0.0
+    return float(helpers.triangle_distances(np.asarray(points)[outside], corners).max())
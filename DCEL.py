@@ -1,6 +1,4 @@
-import random
-import matplotlib.pyplot as plt
-from mpl_toolkits.mplot3d.art3d import Poly3DCollection
+import itertools
 import numpy as np
 
 import helpers
@@ -11,8 +9,22 @@ class DCEL:
         Initializes the DCEL object, stores, our vertices, edges, and faces
         """
         self.vertices = set()  # List of vertices
-        self.edges = {}  # Hash table for edges (key: (start, end), value: Edge)
         self.faces = set()  # set of faces
+        ## Half edges of create_face without a face yet whose twin has one, key: (start, end) Vertex objects.
+        ## Empty when the hull is closed, the insertion path (remove_face, create_cone) never touches it
+        self.open_edges = {}
+
+    @property
+    def edges(self):
+        """
+        Hash table of the half edges (key: (start, end) coordinates, value: Edge), built on demand for plotting and
+        debugging, the DCEL itself only reaches half edges through faces, twins and next pointers
+        """
+        edges = {(edge.start.coordinates, edge.end.coordinates): edge for edge in self.open_edges.values()}
+        for face in self.faces:
+            for edge in self.get_face_edges(face):
+                edges[(edge.start.coordinates, edge.end.coordinates)] = edge
+        return edges
 
     def get_or_create_vertex(self, v):
         """
@@ -29,6 +41,15 @@ class DCEL:
         self.vertices.add(v)
         return v
 
+    def remove_vertex(self, v):
+        """
+        Function to remove a vertex from the DCEL, no edge may still start or end at it
+
+        Args:
+            v (Vertex): The vertex to remove
+        """
+        self.vertices.discard(v)
+
     def create_face(self, points):
         """
         Make a new face from a list of points (vertices).
@@ -55,20 +76,13 @@ class DCEL:
             v1 = vertices[i]
             v2 = vertices[(i + 1) % len(vertices)]
             
-            new_edge = Edge(v1, v2) ## make new edge
-            
-            twin_key = (v2.coordinates, v1.coordinates) ## check if there already is a twin, if not, make one
-            if twin_key in self.edges:
-                twin_edge = self.edges[twin_key]
-                new_edge.twin = twin_edge
-                twin_edge.twin = new_edge
-            else:
+            new_edge = self.open_edges.pop((v1, v2), None) ## the twin already has a face, reuse the open half edge
+            if new_edge is None: ## make the edge and its twin, the twin waits for the face on the other side
+                new_edge = Edge(v1, v2)
                 twin_edge = Edge(v2, v1)
                 new_edge.twin = twin_edge
                 twin_edge.twin = new_edge
-            
-            self.edges[(v1.coordinates, v2.coordinates)] = new_edge
-            self.edges[(v2.coordinates, v1.coordinates)] = twin_edge
+                self.open_edges[(v2, v1)] = twin_edge
             new_edges.append(new_edge)
         
         for i, edge in enumerate(new_edges):
@@ -82,31 +96,76 @@ class DCEL:
         self.faces.add(face)
         return face
 
-                
+    def create_cone(self, horizon, point):
+        """
+        Make the faces joining an ordered horizon to a new point, one triangle per horizon edge, stitched directly:
+        the horizon half edge is the base of its triangle and already twins the face that stays, and the side
+        edges twin the sides of the triangles next to them, so no twin is looked up
+
+        Args:
+            horizon (list[Edge]): The horizon as a cycle, each edge starting where the one before ends, their faces removed
+            point (Vertex): The new apex
+
+        Returns:
+            list[Face]: the new faces, in the order of horizon
+        """
+        point = self.get_or_create_vertex(point)
+        faces = []
+        ups = [] ## edge from the end of each base to the point
+        downs = [] ## edge from the point to the start of each base
+        for base in horizon: ## the base gets a face again
+            up = Edge(base.end, point)
+            down = Edge(point, base.start)
+            base.next, up.next, down.next = up, down, base
+            base.prev, up.prev, down.prev = down, base, up
+            face = Face(base)
+            base.face = up.face = down.face = face
+            faces.append(face)
+            ups.append(up)
+            downs.append(down)
+
+        for i, up in enumerate(ups): ## the side after base i is the side before base i + 1
+            down = downs[(i + 1) % len(downs)]
+            up.twin = down
+            down.twin = up
+        self.faces.update(faces)
+        return faces
+
+    def horizon_cycle(self, first, count, faces):
+        """
+        Puts the boundary edges of a region of faces in order, the edge after a boundary edge is found by turning
+        around its end vertex through the region until an edge whose twin is outside it. The region must be a disk,
+        like the faces a point can see, so the walk gets back to the first edge after all of them
+
+        Args:
+            first (Edge): Any boundary edge, on a face of the region
+            count (int): The number of boundary edges
+            faces (set): The faces of the region
+
+        Returns:
+            list[Edge]: the boundary, each edge starting where the one before it ends
+        """
+        cycle = [first]
+        edge = first
+        for _ in range(count - 1):
+            edge = edge.next
+            while edge.twin.face in faces: ## cross into the next face of the region around the vertex
+                edge = edge.twin.next
+            cycle.append(edge)
+        return cycle
+
     def remove_face(self, face):
         """
-        Remove a face from the DCEL, and remove the edges that belong to the face, if the twin is None, remove bothe edges, if not, set its half edge to None.
+        Remove a face from the DCEL, its half edges lose their face. A half edge whose twin still has a face stays
+        reachable from the twin, the ones on the horizon are handed to create_cone in order by horizon_cycle, so no
+        table of open half edges is kept. Once the twin's face is removed too, nothing points to either of them.
 
         Args:
             face Face: the face to remove
         """
-        edge = face.outer_edge
-        first_edge = edge
         self.faces.discard(face)  # Remove face from set   
-        
-        while True:
-            twin_edge = edge.twin
-            if (edge.start.coordinates, edge.end.coordinates) in self.edges:
-                self.edges[(edge.start.coordinates, edge.end.coordinates)].face = None  # Remove edge from hash table
-            
-                # Check if the twin has a face, if not, remove it
-                if twin_edge.face is None:
-                    del self.edges[(edge.end.coordinates, edge.start.coordinates)]
-                    del self.edges[(edge.start.coordinates, edge.end.coordinates)]
-                            
-            edge = edge.next
-            if edge == first_edge:
-                break  # Loop through face complete
+        for edge in self.get_face_edges(face):
+            edge.face = None
 
     def create_tetrahedron(self, p1, p2, p3, p4):
         """
@@ -119,20 +178,31 @@ class DCEL:
             p4 (Vertex): A point to use to create the initial tetrahedron
         """
         # Add vertices to the hull.
-        self.vertices.union([p1, p2, p3, p4])
+        for p in (p1, p2, p3, p4):
+            self.get_or_create_vertex(p)
         
-        # Compute the centroid of the tetrahedron (strictly interior) to make sure evreything is oriented correctly
-        centroid = helpers.Vector(
-            (p1.x + p2.x + p3.x + p4.x) / 4.0,
-            (p1.y + p2.y + p3.y + p4.y) / 4.0,
-            (p1.z + p2.z + p3.z + p4.z) / 4.0
-        )
-        
-        self.create_face(helpers.oriented_face([p1, p2, p3], centroid))  # Base face
-        self.create_face(helpers.oriented_face([p1, p3, p4], centroid))  # Side face 1
-        self.create_face(helpers.oriented_face([p1, p4, p2], centroid))  # Side face 2
-        self.create_face(helpers.oriented_face([p2, p4, p3], centroid))  # Side face 3
+        # Orient every face so the corner it misses is behind it
+        self.create_face(helpers.oriented_face([p1, p2, p3], p4))  # Base face
+        self.create_face(helpers.oriented_face([p1, p3, p4], p2))  # Side face 1
+        self.create_face(helpers.oriented_face([p1, p4, p2], p3))  # Side face 2
+        self.create_face(helpers.oriented_face([p2, p4, p3], p1))  # Side face 3
+
 
+    def create_flat_hull(self, points):
+        """
+        Build the hull of a flat input, a convex polygon covered by two fans of triangles, one facing each way,
+        so the DCEL is still closed and made of triangles. The fans start from different corners so they share no diagonal
+
+        Args:
+            points (list[Vertex]): the corners of the polygon in counter clockwise order seen from the front
+        """
+        for p in points:
+            self.get_or_create_vertex(p)
+        for i in range(1, len(points) - 1):
+            self.create_face([points[0], points[i], points[i + 1]])  # front, fan around the first corner
+        back = points[1:] + points[:1]
+        for i in range(1, len(back) - 1):
+            self.create_face([back[0], back[i + 1], back[i]])  # back, fan around the second corner
         
     def get_face_vertices(self, face):
         """
@@ -154,6 +224,44 @@ class DCEL:
                 break
         return verts
 
+    def get_face_plane(self, face):
+        """
+        Helper method to get the cached supporting plane of a face
+
+        Args:
+            face (Face): The face to get the plane for
+
+        Returns:
+            tuple: the outward normal (x, y, z) of the face and its offset
+        """
+        return face.normal, face.offset
+
+    def get_face_planes(self, faces):
+        """
+        Helper method to stack the cached planes of many faces for helpers.batch_visibility
+
+        Args:
+            faces (list[Face]): The faces to get planes for
+
+        Returns:
+            tuple: the (F,3) array of normals and the (F,) array of offsets, in the order of faces
+        """
+        normals = np.array([face.normal for face in faces], dtype=np.float64).reshape(-1, 3)
+        offsets = np.array([face.offset for face in faces], dtype=np.float64)
+        return normals, offsets
+
+    def get_face_errors(self, faces):
+        """
+        Helper method to stack the error weights of the cached planes of many faces, see helpers.face_plane
+
+        Args:
+            faces (list[Face]): The faces to get error weights for
+
+        Returns:
+            np.ndarray: the (F,) error weights, in the order of faces
+        """
+        return np.array([face.error for face in faces], dtype=np.float64)
+
     def get_face_edges(self, face):
         """
         Helper method to get the edges defining a face.
@@ -174,65 +282,89 @@ class DCEL:
                 break
         return edges
 
-    def plot(self, normal_mode = False, ax=None, highlight=None):
+    def to_arrays(self):
         """
-        method to plot the DCEL in matplotlib
+        Method to flatten the triangle faces of the DCEL into an indexed mesh, only the vertices used by a face are kept
 
-        Args:
-            normal_mode (bool, optional): A boolean flag of whether or not to show the normals of the faces. Defaults to False.
+        Returns:
+            tuple: the (V,3) float64 array of vertex coordinates, the (F,3) int32 array of the rows of the
+            vertices of each face in order, and the list of the V Vertex objects
         """
-        if highlight is not None:
-            highlight = set(highlight)
-            
-        if ax is None:
-            fig = plt.figure()
-            ax = fig.add_subplot(111, projection='3d')
-
-        ## Plot vertices
-        for vertex in self.vertices:
-            ax.scatter(vertex.coordinates[0], vertex.coordinates[1], vertex.coordinates[2], color='b', s=50)
-
-        ## Plot edges
-        for edge in self.edges.values():
-            x_vals = [edge.start.coordinates[0], edge.end.coordinates[0]]
-            y_vals = [edge.start.coordinates[1], edge.end.coordinates[1]]
-            z_vals = [edge.start.coordinates[2], edge.end.coordinates[2]]
-            if (highlight is not None and edge in highlight or highlight is not None and edge.twin in highlight):
-                ax.plot(x_vals, y_vals, z_vals, color='r', linewidth=1)
-            else:
-                ax.plot(x_vals, y_vals, z_vals, color='k', linewidth=1)
+        rows = {} ## Vertex: row
+        corners = np.fromiter((rows.setdefault(vertex, len(rows)) for face in self.faces
+                               for vertex in (face.outer_edge.start, face.outer_edge.next.start, face.outer_edge.prev.start)),
+                              dtype=np.int32)
+        vertices = list(rows)
+        coords = np.array([vertex.coordinates for vertex in vertices], dtype=np.float64).reshape(-1, 3)
+        return coords, corners.reshape(-1, 3), vertices
+
+    def validate(self):
+        """
+        Method to check the structure of the DCEL: every half edge has a face and a twin going the other way,
+        next and prev undo each other, the half edges of every face form one closed cycle, and V - E + F = 2
 
+        Returns:
+            list[str]: a description of every broken rule, empty when the DCEL is a valid closed surface
+        """
+        problems = []
+        if self.open_edges:
+            problems.append(f'{len(self.open_edges)} half edges are still open')
+        edges = self.edges
+        for (start, end), edge in edges.items():
+            if edge.face is None:
+                problems.append(f'edge {edge} has no face')
+            if edge.twin is None or edge.twin.twin is not edge or edge.twin.start is not edge.end:
+                problems.append(f'edge {edge} and its twin do not match')
+            if edge.next is None or edge.prev is None or edge.next.prev is not edge or edge.prev.next is not edge:
+                problems.append(f'edge {edge} and its next/prev do not match')
+            elif edge.next.start is not edge.end or edge.next.face is not edge.face:
+                problems.append(f'edge {edge} and its next are not on the same face')
+            elif edge.twin is not None and edges.get((end, start)) is not edge.twin:
+                problems.append(f'edge {edge} has a twin that is on no face')
+
+        in_cycles = 0
         for face in self.faces:
-            verts = self.get_face_vertices(face)
-            
-            if normal_mode:
-                p1, p2, p3 = verts[0], verts[1], verts[2]
-                v1 = helpers.Vector(p2.x - p1.x, p2.y - p1.y, p2.z - p1.z)
-                v2 = helpers.Vector(p3.x - p1.x, p3.y - p1.y, p3.z - p1.z)
-                normal_vector = v1.cross_product(v2)
-                
-                for i in range(len(verts)):
-                    verts[i] = verts[i].coordinates
-                    
-                centroid_face = np.mean(verts, axis=0)
-
-                # Plot the normal vector 
-                ax.quiver(centroid_face[0], centroid_face[1], centroid_face[2],
-                        normal_vector.x, normal_vector.y, normal_vector.z,
-                        color='g', length=10, normalize=True)
+            edge = face.outer_edge
+            for _ in range(len(edges)):
+                if edge is None or edge.face is not face:
+                    problems.append(f'the cycle of face {face} leaves the face')
+                    break
+                in_cycles += 1
+                edge = edge.next
+                if edge is face.outer_edge:
+                    break
             else:
-                for i in range(len(verts)):
-                    verts[i] = verts[i].coordinates
+                problems.append(f'the cycle of face {face} does not close')
+        if not problems and in_cycles != len(edges):
+            problems.append(f'{len(edges) - in_cycles} edges are on no face cycle')
 
-            ax.add_collection3d(Poly3DCollection([verts], alpha=.5))
+        vertices = len({edge.start for edge in edges.values()}) ## vertices left inside the hull aren't on the surface
+        euler = vertices - len(edges) // 2 + len(self.faces)
+        if euler != 2:
+            problems.append(f'V - E + F = {euler}, not 2')
+        return problems
 
-        ## Set labels and aspect ratio
-        ax.set_xlabel('X')
-        ax.set_ylabel('Y')
-        ax.set_zlabel('Z')
-        ax.set_box_aspect([1, 1, 1])
+    def plot(self, normal_mode = False, ax=None, highlight=None, max_faces=None):
+        """
+        method to plot the DCEL in matplotlib, see visualization.plot_dcel
+
+        Args:
+            normal_mode (bool, optional): A boolean flag of whether or not to show the normals of the faces. Defaults to False.
+            max_faces (int, optional): Plot a coarser hull when the hull has more faces, see visualization.decimate. Defaults to None.
+        """
+        import visualization ## matplotlib is only loaded when plotting
+        visualization.plot_dcel(self, normal_mode, ax, highlight, max_faces)
 
-        plt.show()
+    def render(self, path, **kwargs):
+        """
+        method to render the DCEL to a PNG file offscreen, see visualization.render_png
+
+        Args:
+            path (str): The file to write
+            **kwargs: passed to visualization.render_png, for example max_faces, size, elev and azim
+        """
+        import visualization
+        visualization.render_png(self, path, **kwargs)
     
     def __repr__(self): ## for degbugging
         ret = f'DCEL: {len(self.vertices)} vertices, {len(self.edges)} edges, {len(self.faces)} faces'
@@ -244,6 +376,8 @@ class DCEL:
     def __str__(self):
         return self.__repr__()
 
+_next_edge_id = itertools.count().__next__ ## a counter is unique and much cheaper than a random number per half edge
+
 class Edge: 
     """
     Edge class to be held in the DCEL
@@ -260,7 +394,7 @@ class Edge:
             next (Edge, optional): the next edge inident on the same face. Defaults to None.
             prev (Edge, optional): the previous edge incident on the same face. Defaults to None.
         """
-        self.id = random.randint(0, 1000) # Unique identifier
+        self.id = _next_edge_id() # Unique identifier, next is shadowed by the argument
         self.start = start
         self.end = end
         self.twin = None  # The opposite edge
@@ -278,14 +412,16 @@ class Vertex:
     """
     Vertex class to be held in the DCEL
     """
-    def __init__(self, coordinates):
+    def __init__(self, coordinates, index = None):
         """
         Initialize Vertex to hold a reference to an edge incident on it.
         Args:
             coordinates (Vertex): the position of the vertex
+            index (int, optional): the row of the vertex in the point array of the hull being built. Defaults to None.
         """
         self.coordinates = coordinates
         self.x, self.y, self.z = coordinates
+        self.index = index
         self.edge = None
         
     def __repr__(self): ## for degbugging
@@ -300,12 +436,14 @@ class Face:
     """
     def __init__(self, edge):
         """
-        Initialize the face to hold a edge incident on the face, any edge that refers to this face as its face
+        Initialize the face to hold a edge incident on the face, any edge that refers to this face as its face,
+        and cache the supporting plane of the face from its first three vertices, with the error weight of the plane
 
         Args:
-            edge (Edge): the edge that is indicent on the face
+            edge (Edge): the edge that is indicent on the face, its next pointers must already form the face cycle
         """
         self.outer_edge = edge
+        self.normal, self.offset, self.error = helpers.face_plane(edge.start, edge.next.start, edge.next.next.start)
         
     def __repr__(self): ## for degbugging
         return f'Face: {self.outer_edge})'
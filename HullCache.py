@@ -0,0 +1,249 @@
+from collections import OrderedDict
+import hashlib
+import os
+
+import numpy as np
+
+from RandomIncHull import RandomIncrementalHull3D
+
+## header of a .hull file, followed by the vertices as float64, the triangles and the sorted row of each hull vertex,
+## the last two as unsigned integers of the given width, little endian throughout
+HULL_MAGIC = b'HULL'
+HULL_VERSION = 1
+HULL_HEADER = np.dtype([('magic', 'S4'), ('version', '<u1'), ('triangle_width', '<u1'), ('index_width', '<u1'),
+                        ('reserved', '<u1'), ('points', '<u8'), ('vertices', '<u4'), ('triangles', '<u4')])
+
+class HullCache:
+    """
+    Content addressed cache of hull meshes. A point set is keyed by a hash of its rows in sorted order, so the same points
+    given in any order hit the same entry, and a hit returns the mesh without running any geometry. The key also covers the
+    engine, its options and the .hull format version, so caches built differently never share an entry. The most recently
+    used meshes are kept in memory up to max_entries and max_bytes, and with a directory every new mesh is also written
+    there as a compact .hull file, so evicted meshes, other processes and later runs still hit.
+    Meshes are stored against the sorted points, a hit maps the input indices back through the order of the query.
+    """
+    def __init__(self, max_entries = 128, max_bytes = 256 << 20, directory = None, engine = RandomIncrementalHull3D, **kwargs):
+        """
+        Initializes an empty cache
+
+        Args:
+            max_entries (int, optional): The most meshes kept in memory. Defaults to 128.
+            max_bytes (int, optional): The most bytes of mesh arrays kept in memory. Defaults to 256 MiB.
+            directory (str, optional): The directory of the on disk store, made if missing, None to keep only the memory. Defaults to None.
+            engine (type, optional): The hull class built on a miss, RandomIncrementalHull3D or QuickHull3D. Defaults to RandomIncrementalHull3D.
+            **kwargs: passed to the engine (dcel, prefilter, ...)
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.engine = engine
+        self.kwargs = kwargs
+        self.settings = _settings(engine, kwargs) ## hashed into every key
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        self.entries = OrderedDict() ## key: (vertices, triangles, sorted rows), the least recently used first
+        self.memory_bytes = 0 ## bytes of the arrays in self.entries
+
+        self.hits = 0 ## found in memory
+        self.disk_hits = 0 ## found on disk
+        self.misses = 0 ## built
+        self.evictions = 0
+        self.bytes_read = 0 ## bytes of .hull files read
+        self.bytes_written = 0 ## bytes of .hull files written
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, points):
+        key, _ = self.key(points)
+        return key in self.entries or (self.directory is not None and os.path.exists(self.path(key)))
+
+    def key(self, points):
+        """
+        The order independent key of a point set, a 128 bit BLAKE2 hash of its float64 rows sorted by x, y then z,
+        and of the settings of the cache
+
+        Args:
+            points (np.ndarray): The (N,3) points
+
+        Returns:
+            tuple: the hex key, and the order that sorts the rows (the sorted row i is points[order[i]])
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        order = np.lexsort(points.T[::-1])
+        rows = np.ascontiguousarray(points[order]) + 0.0 ## -0.0 and 0.0 are the same point
+        digest = hashlib.blake2b(rows.data, digest_size=16)
+        digest.update(np.uint64(len(rows)).tobytes())
+        digest.update(self.settings)
+        return digest.hexdigest(), order
+
+    def path(self, key):
+        """
+        The .hull file of a key in the on disk store
+        """
+        return os.path.join(self.directory, key + '.hull')
+
+    def mesh(self, points):
+        """
+        The hull of a point set as an indexed mesh, from memory, from disk, or built and cached
+
+        Args:
+            points (np.ndarray): The (N,3) points
+
+        Returns:
+            tuple: the same as RandomIncrementalHull3D.export_mesh, the (V,3) hull vertices, the (F,3) vertex rows of each
+            face and the (V,) input index of each hull vertex. The first two are shared with the cache and read only
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        key, order = self.key(points)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+        else:
+            entry = self.read(key) if self.directory is not None else None
+            if entry is not None:
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+                vertices, triangles, indices = self.engine(points, **self.kwargs).export_mesh()
+                rows = np.empty(len(points), dtype=np.intp)
+                rows[order] = np.arange(len(points)) ## the sorted row of every input row
+                entry = (vertices, triangles, rows[indices])
+                if self.directory is not None:
+                    self.write(key, entry, len(points))
+            self.insert(key, entry)
+
+        vertices, triangles, rows = entry
+        return vertices, triangles, order[rows]
+
+    def insert(self, key, entry):
+        """
+        Keeps an entry in memory, evicting the least recently used ones past max_entries or max_bytes
+
+        Args:
+            key (str): The key
+            entry (tuple): The vertices, triangles and sorted rows
+        """
+        for array in entry:
+            array.setflags(write=False) ## handed out on every hit
+        self.entries[key] = entry
+        self.memory_bytes += sum(array.nbytes for array in entry)
+        while len(self.entries) > 1 and (len(self.entries) > self.max_entries or self.memory_bytes > self.max_bytes):
+            _, evicted = self.entries.popitem(last=False)
+            self.memory_bytes -= sum(array.nbytes for array in evicted)
+            self.evictions += 1
+
+    def write(self, key, entry, points):
+        """
+        Writes an entry to the on disk store, through a temporary file so readers never see half of it
+
+        Args:
+            key (str): The key
+            entry (tuple): The vertices, triangles and sorted rows
+            points (int): The number of points the rows index
+        """
+        vertices, triangles, rows = entry
+        triangle_type, index_type = _index_type(len(vertices)), _index_type(points)
+        header = np.zeros(1, dtype=HULL_HEADER)
+        header[0] = (HULL_MAGIC, HULL_VERSION, triangle_type.itemsize, index_type.itemsize, 0, points, len(vertices), len(triangles))
+        path = self.path(key)
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'wb') as f:
+            f.write(header.tobytes())
+            f.write(vertices.astype('<f8').tobytes())
+            f.write(triangles.astype(triangle_type).tobytes())
+            f.write(rows.astype(index_type).tobytes())
+            self.bytes_written += f.tell()
+        os.replace(temporary, path)
+
+    def read(self, key):
+        """
+        Reads an entry from the on disk store
+
+        Args:
+            key (str): The key
+
+        Returns:
+            tuple: the vertices, triangles and sorted rows, or None when the key isn't stored or its file is damaged
+        """
+        try:
+            with open(self.path(key), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        if len(data) < HULL_HEADER.itemsize:
+            return None
+        header = np.frombuffer(data, dtype=HULL_HEADER, count=1)[0]
+        if header['magic'] != HULL_MAGIC or header['version'] != HULL_VERSION:
+            return None
+        counts = (int(header['vertices']) * 3, int(header['triangles']) * 3, int(header['vertices']))
+        types = (np.dtype('<f8'), np.dtype(f"<u{header['triangle_width']}"), np.dtype(f"<u{header['index_width']}"))
+        if len(data) != HULL_HEADER.itemsize + sum(count * kind.itemsize for count, kind in zip(counts, types)):
+            return None
+        arrays = []
+        offset = HULL_HEADER.itemsize
+        for count, kind in zip(counts, types):
+            arrays.append(np.frombuffer(data, dtype=kind, count=count, offset=offset))
+            offset += count * kind.itemsize
+        self.bytes_read += len(data)
+        vertices, triangles, rows = arrays
+        return (vertices.reshape(-1, 3).copy(), triangles.reshape(-1, 3).astype(np.int32),
+                rows.astype(np.intp))
+
+    def clear(self):
+        """
+        Empties the memory, the on disk store is kept
+        """
+        self.entries.clear()
+        self.memory_bytes = 0
+
+    def as_dict(self):
+        """
+        The counters as a dict, ready for json
+
+        Returns:
+            dict: the hits, disk hits, misses, evictions, hit rate, entries and bytes in memory, and bytes read and written
+        """
+        lookups = self.hits + self.disk_hits + self.misses
+        return {'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses, 'evictions': self.evictions,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0, 'entries': len(self.entries),
+                'memory_bytes': self.memory_bytes, 'bytes_read': self.bytes_read, 'bytes_written': self.bytes_written}
+
+    def __repr__(self): ## for degbugging
+        stats = self.as_dict()
+        return (f"HullCache: {stats['hits']} hits, {stats['disk_hits']} disk hits, {stats['misses']} misses, "
+                f"hit rate {stats['hit_rate']:.2%}, {stats['entries']} entries, {stats['memory_bytes']} bytes in memory, "
+                f"{stats['evictions']} evictions, {stats['bytes_read']} bytes read, {stats['bytes_written']} bytes written")
+
+    def __str__(self):
+        return self.__repr__()
+
+def _settings(engine, kwargs):
+    """
+    The build settings that change a cached mesh, as bytes to hash: the .hull format version, the engine and its options,
+    classes such as the DCEL by their full name
+
+    Args:
+        engine (type): The hull class
+        kwargs (dict): The options passed to it
+
+    Returns:
+        bytes: the settings
+    """
+    def name(value):
+        return f'{value.__module__}.{value.__qualname__}' if isinstance(value, type) else repr(value)
+    options = ','.join(f'{key}={name(value)}' for key, value in sorted(kwargs.items()))
+    return f'{HULL_VERSION};{name(engine)};{options}'.encode()
+
+def _index_type(count):
+    """
+    The smallest little endian unsigned integer type that holds the rows up to count
+
+    Args:
+        count (int): The number of rows
+
+    Returns:
+        np.dtype: '<u2' or '<u4'
+    """
+    return np.dtype('<u2') if count <= 1 << 16 else np.dtype('<u4')
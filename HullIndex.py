@@ -0,0 +1,228 @@
+import numpy as np
+
+from ArrayDCEL import ArrayDCEL
+from RandomIncHull import RandomIncrementalHull3D
+
+class HullIndex:
+    """
+    Dobkin-Kirkpatrick style hierarchy of a convex hull for containment queries.
+    Every level is the hull of the vertices of the level below it minus an independent set of low degree vertices,
+    so there are O(log h) levels. Seen from a center point inside the smallest level, every face is a cone and the cones
+    of a level tile all directions. The face of a coarse level that a query's direction falls in overlaps at most a few
+    faces of the level below (the star of the removed vertex under it), so a query walks down the levels testing a
+    handful of cones each, and the face of the hull it ends on is the only plane the query has to be tested against.
+    """
+    def __init__(self, vertices, triangles, max_degree = 8, coarsest = 16):
+        """
+        Builds the hierarchy
+
+        Args:
+            vertices (np.ndarray): The (V,3) vertices of the hull, for example from RandomIncrementalHull3D.export_mesh
+            triangles (np.ndarray): The (F,3) vertex rows of each face, counter clockwise seen from outside
+            max_degree (int, optional): Only vertices with at most this many neighbors are removed. Defaults to 8.
+            coarsest (int, optional): Stop once a level has at most this many vertices. Defaults to 16.
+        """
+        self.vertices = np.ascontiguousarray(vertices, dtype=np.float64)
+        levels = [np.asarray(triangles, dtype=np.intp)]
+        links = [] ## links[i][g] lists the faces of level i overlapping face g of level i + 1, padded with -1
+        while True:
+            fine = levels[-1]
+            active = np.unique(fine)
+            if len(active) <= coarsest:
+                break
+            neighbors = _neighbors(fine, len(self.vertices))
+            removed = _independent_set(active, neighbors, max_degree)
+            kept = np.setdiff1d(active, removed)
+            if not len(removed) or len(kept) < 4:
+                break
+            _, coarse, indices = RandomIncrementalHull3D(self.vertices[kept], dcel=ArrayDCEL).export_mesh()
+            coarse = kept[indices][coarse]
+            levels.append(coarse)
+            links.append(_link(fine, coarse, removed, neighbors))
+
+        self.center = self.vertices[np.unique(levels[-1])].mean(axis=0) ## inside the smallest level, so inside every level
+        self.triangles = levels
+        self.links = links
+        self.widths = [np.count_nonzero(link >= 0, axis=1) for link in links] ## most faces are on both levels, one child
+        self.sides = [self._sides(level) for level in levels]
+        corners = self.vertices[levels[0]]
+        self.normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+        self.offsets = np.einsum('ij,ij->i', self.normals, corners[:, 0])
+
+    def _sides(self, triangles):
+        """
+        The unit normals of the three planes through the center and each edge of every face, pointing into the cone
+
+        Args:
+            triangles (np.ndarray): The (F,3) vertex rows of the faces of a level
+
+        Returns:
+            np.ndarray: the (F,3,3) side normals
+        """
+        corners = self.vertices[triangles] - self.center
+        sides = np.cross(corners, np.roll(corners, -1, axis=1))
+        lengths = np.linalg.norm(sides, axis=2, keepdims=True)
+        return sides / np.where(lengths > 0, lengths, 1)
+
+    @property
+    def depth(self):
+        """
+        The number of levels
+        """
+        return len(self.triangles)
+
+    def locate(self, points, block = 8192):
+        """
+        Finds, for every point, the face of the hull whose cone from the center contains it
+
+        Args:
+            points (np.ndarray): The (N,3) points to locate
+            block (int, optional): The number of points located at a time. Defaults to 8192.
+
+        Returns:
+            np.ndarray: the (N,) row of the face in the triangles of the hull
+        """
+        points = np.asarray(points).reshape(-1, 3)
+        faces = np.empty(len(points), dtype=np.intp)
+        for start in range(0, len(points), block):
+            directions = np.asarray(points[start:start + block], dtype=np.float64) - self.center
+            directions /= np.maximum(np.linalg.norm(directions, axis=1, keepdims=True), np.finfo(np.float64).tiny)
+
+            ## the smallest level is tested against every face
+            sides = self.sides[-1]
+            current = _inside(directions @ sides.reshape(-1, 3).T, len(sides)).argmax(axis=1)
+            for level in range(self.depth - 2, -1, -1):
+                candidates = self.links[level][current] ## (n, c), -1 is padding
+                walk = np.flatnonzero(self.widths[level][current] > 1)
+                current = candidates[:, 0]
+                if len(walk):
+                    candidates = candidates[walk]
+                    inside = _inside(np.einsum('ncsk,nk->ncs', self.sides[level][candidates], directions[walk]), candidates.shape[1])
+                    inside[candidates < 0] = -np.inf
+                    current[walk] = candidates[np.arange(len(walk)), inside.argmax(axis=1)]
+
+            ## directions that slipped past the links (only with coplanar hull vertices), are located directly
+            lost = _inside(np.einsum('nsk,nk->ns', self.sides[0][current], directions), 1)[:, 0] < -1e-9
+            if lost.any():
+                current[lost] = _inside(directions[lost] @ self.sides[0].reshape(-1, 3).T, len(self.sides[0])).argmax(axis=1)
+            faces[start:start + block] = current
+        return faces
+
+    def contains(self, points, tolerance = 1e-9, block = 8192):
+        """
+        Tests which points are inside the hull, each point is located with the hierarchy and only tested
+        against the plane of its face, O(log h) per point
+
+        Args:
+            points (np.ndarray): The (N,3) points to test, can be memory mapped
+            tolerance (float, optional): How far outside a face a point may be and still count as inside,
+                relative to the size of the hull. Defaults to 1e-9.
+            block (int, optional): The number of points tested at a time. Defaults to 8192.
+
+        Returns:
+            np.ndarray: the (N,) boolean mask of the points inside or on the hull
+        """
+        points = np.asarray(points).reshape(-1, 3)
+        lengths = np.linalg.norm(self.normals, axis=1)
+        slack = tolerance * max(np.abs(self.vertices).max(initial=0), 1.0) * lengths
+        inside = np.empty(len(points), dtype=bool)
+        for start in range(0, len(points), block):
+            chunk = np.asarray(points[start:start + block], dtype=np.float64)
+            faces = self.locate(chunk, block)
+            inside[start:start + block] = (np.einsum('ij,ij->i', chunk, self.normals[faces])
+                                           <= self.offsets[faces] + slack[faces])
+        return inside
+
+def _inside(distances, faces):
+    """
+    How far inside its cone each direction is for each face, the smallest of its three side distances
+
+    Args:
+        distances (np.ndarray): The side distances of n directions, (n, faces, 3) or (n, faces * 3)
+        faces (int): The number of faces per direction
+
+    Returns:
+        np.ndarray: the (n, faces) distances, negative when a direction is outside the cone
+    """
+    distances = distances.reshape(-1, faces, 3)
+    return np.minimum(np.minimum(distances[:, :, 0], distances[:, :, 1]), distances[:, :, 2]) ## faster than min(axis=2)
+
+def _neighbors(triangles, count):
+    """
+    The neighbors of every vertex of a closed triangle mesh
+
+    Args:
+        triangles (np.ndarray): The (F,3) vertex rows of the faces
+        count (int): The number of vertex rows
+
+    Returns:
+        list[np.ndarray]: the neighbors of each vertex row, empty for rows the mesh doesn't use
+    """
+    starts = triangles.ravel()
+    ends = np.roll(triangles, -1, axis=1).ravel() ## every edge shows up once in each direction on a closed mesh
+    order = np.argsort(starts, kind='stable')
+    bounds = np.searchsorted(starts[order], np.arange(count + 1))
+    ends = ends[order]
+    return [ends[bounds[v]:bounds[v + 1]] for v in range(count)]
+
+def _independent_set(active, neighbors, max_degree):
+    """
+    Greedily picks vertices with at most max_degree neighbors, no two of them adjacent
+
+    Args:
+        active (np.ndarray): The vertex rows of the level
+        neighbors (list[np.ndarray]): The neighbors of each vertex row
+        max_degree (int): The largest number of neighbors a picked vertex may have
+
+    Returns:
+        np.ndarray: the picked vertex rows
+    """
+    blocked = set()
+    picked = []
+    for vertex in active.tolist():
+        if vertex in blocked or len(neighbors[vertex]) > max_degree:
+            continue
+        picked.append(vertex)
+        blocked.update(neighbors[vertex].tolist())
+    return np.array(picked, dtype=np.intp)
+
+def _link(fine, coarse, removed, neighbors):
+    """
+    For every face of the coarse level, the faces of the fine level under it. A face of both levels is its own child,
+    a new face covers the hole left by one removed vertex, all three of its corners are neighbors of that vertex,
+    and its children are the faces around that vertex
+
+    Args:
+        fine (np.ndarray): The (F,3) faces of the finer level
+        coarse (np.ndarray): The (G,3) faces of the coarser level
+        removed (np.ndarray): The vertex rows removed between the two levels
+        neighbors (list[np.ndarray]): The neighbors of each vertex row in the finer level
+
+    Returns:
+        np.ndarray: the (G,c) faces of the fine level under each coarse face, padded with -1
+    """
+    same = {tuple(np.roll(face, -face.argmin()).tolist()): i for i, face in enumerate(fine)}
+    around = {} ## removed vertex: the fine faces around it
+    for i, face in enumerate(fine.tolist()):
+        for vertex in face:
+            around.setdefault(vertex, []).append(i)
+    removed = set(removed.tolist())
+    holes = {} ## vertex: the removed vertices next to it
+    for vertex in removed:
+        for neighbor in neighbors[vertex].tolist():
+            holes.setdefault(neighbor, set()).add(vertex)
+
+    children = []
+    for face in coarse:
+        key = tuple(np.roll(face, -face.argmin()).tolist())
+        if key in same:
+            children.append([same[key]])
+            continue
+        corners = [holes.get(vertex, set()) for vertex in key]
+        under = set.intersection(*corners) or set.union(*corners) ## the hole the face covers, all nearby holes if unsure
+        children.append(sorted({child for vertex in under for child in around[vertex]}))
+
+    links = np.full((len(children), max(len(child) for child in children)), -1, dtype=np.intp)
+    for i, child in enumerate(children):
+        links[i, :len(child)] = child
+    return links
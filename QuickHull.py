@@ -0,0 +1,58 @@
+from collections import deque
+
+import numpy as np
+from RandomIncHull import RandomIncrementalHull3D
+
+class QuickHull3D(RandomIncrementalHull3D):
+    def __init__(self, points, *args, **kwargs):
+        """
+        Initializes the Quickhull object and creates the hull. Uses the same DCEL, initial tetrahedron,
+        conflict graph and horizon code as RandomIncrementalHull3D, but instead of a random point it always adds
+        the farthest point outside of a face, so interior points are dropped in the first few rounds without being added.
+        Both engines give the same solid with every corner of it as a vertex, but on input with 4 or more points on a facet
+        the faces don't match: coplanar facets are triangulated differently and RandomIncrementalHull3D may keep points
+        on a facet or an edge as vertices too, so only the volume and the corners can be compared between engines
+
+        Args:
+            points (3 dimensional tuples): A list of points that the user wants a hull made from
+            *args, **kwargs: The same options as RandomIncrementalHull3D (dis_inc, dcel, ...)
+        """
+        self.outside_faces = deque() ## faces that had points outside of them when they were made
+        super().__init__(points, *args, **kwargs)
+
+    def get_conflicts(self, points, faces):
+        """
+        Updates the conflict graph like RandomIncrementalHull3D.get_conflicts, and queues every new face
+        that has points outside of it
+
+        Args:
+            points (List(np.ndarray)): For each face, the indices of the candidate points that could see it
+            faces (List): The list of new faces to add to the conflict graph
+        """
+        super().get_conflicts(points, faces)
+        self.outside_faces.extend(face for face in faces if face in self.conflict_faces)
+
+    def insertion_order(self, points):
+        """
+        Takes the queued faces in order, and yields the point farthest outside of each face that still has points outside of it.
+        Once no face has points outside of it, the leftover points are inside the hull, they are only counted and never
+        become a Vertex or enter the DCEL
+
+        Args:
+            points (np.ndarray): the indices of the points to add, every one of them is either yielded or left inside
+
+        Yields:
+            Vertex: the next point to add to the hull
+        """
+        added = 0
+        while self.outside_faces:
+            face = self.outside_faces.popleft()
+            conflicts = self.conflict_faces.get(face)
+            if conflicts is None: ## removed since it was queued
+                continue
+            normal, _ = self.hull.get_face_plane(face)
+            added += 1
+            yield self.vertex(conflicts[np.argmax(self.coords[conflicts] @ np.asarray(normal))])
+
+        if self.stats is not None:
+            self.stats.interior += len(points) - added
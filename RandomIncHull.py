@@ -1,81 +1,317 @@
 from collections import deque
 import time
 
-from matplotlib import pyplot as plt
+import numpy as np
+import exporters
 import helpers
 from DCEL import DCEL, Vertex
-import random
+from instrumentation import HullStats
 
 class RandomIncrementalHull3D:
-    def __init__(self, points, dis_inc = False):
+    def __init__(self, points, dis_inc = False, dcel = DCEL, prefilter = False, stats = False, trace = False,
+                 order = 'shuffle', curve = 'hilbert', seed = None):
         """
         Initializes the Random Incremental Hull object and creates the hull
 
         Args:
-            points (3 dimensional tuples): A list of points that the user wants a hull made from
+            points (3 dimensional tuples or np.ndarray): A list of points that the user wants a hull made from,
+                or an (N,3) array of them, which can be memory mapped (see loaders.py)
             dis_inc (bool): A flag to display if you want to visualize the incremental hull as its being built
+            dcel (type, optional): The DCEL class to store the hull in, DCEL or ArrayDCEL. Defaults to DCEL.
+            prefilter (bool, optional): A flag to drop the points strictly inside the polytope of the extreme points
+                (helpers.akl_toussaint_filter) before building, they are never added to the DCEL. Defaults to False.
+            stats (bool, optional): A flag to count the work done and time each phase of every insertion in self.stats,
+                a HullStats. When off self.stats is None and nothing is counted. Defaults to False.
+            trace (bool, optional): A flag to also keep one record per insertion in self.stats.trace, turns on stats. Defaults to False.
+            order (str, optional): The order the points are inserted in, 'shuffle' for a random order, 'brio' for rounds of
+                random size that follow a space filling curve (helpers.brio_order), only faster when most points end up on
+                the hull, or 'input' for the order they are given in, which is slow on sorted input. Defaults to 'shuffle'.
+            curve (str, optional): The space filling curve of the 'brio' order, 'hilbert' or 'morton'. Defaults to 'hilbert'.
+            seed (int, optional): The seed of the random order, for repeatable builds. Defaults to None.
+
+        Raises:
+            ValueError: an unknown order, points that aren't finite, or fewer than 3 points that are not on one line
         """
-        self.points = list(map(lambda x: Vertex(x), points))
-        self.hull = DCEL()
-        random.shuffle(points) ## randomized insertion order
-        self.conflict_faces = {} ## face: [vertices that use it as a conflict face]
-        self.conflict_vertices = {} ## vertex: [face]
-        self.hull.create_tetrahedron(self.points[0], self.points[1], self.points[2], self.points[3])
+        if order not in ('brio', 'shuffle', 'input'):
+            raise ValueError(f"Unknown insertion order {order!r}, use 'brio', 'shuffle' or 'input'.")
+        self.order = order
+        self.curve = curve
+        self.rng = np.random.default_rng(seed)
+        self.stats = HullStats(trace) if stats or trace else None
+        if not isinstance(points, np.ndarray):
+            points = np.array(points, dtype=np.float64)
+        points = points.reshape(-1, 3) ## a view, mapped points are only read below
+        self.input_indices = np.arange(len(points)) ## row i holds the index in the input of point i
+        self.discarded = 0 ## number of points dropped by the prefilter
+        self.hausdorff_error = 0.0 ## bound on how far the exact hull of the input reaches past this one, see ApproxHull.py
+        if prefilter:
+            keep = helpers.akl_toussaint_filter(points)
+            self.input_indices = np.flatnonzero(keep)
+            points = points[keep]
+            self.discarded = len(keep) - len(points)
+        self.coords = np.asarray(points, dtype=np.float64) ## row i holds the coordinates of point i, float64 input isn't copied
+        if not np.isfinite(self.coords).all():
+            raise ValueError("The points must be finite, they hold NaN or infinity.")
+        self.reach = float(np.abs(self.coords).max(initial=0)) ## largest absolute coordinate, scales the plane error bounds
+        self.points_seen = len(self.input_indices) + self.discarded ## number of input points so far, add_points counts on from here
+        self.dcel = dcel
+        self.hull_index = None ## HullIndex for contains, made by build_index
         self.needs_update = []
         self.new_faces = []
         self.dis_inc = dis_inc
         self.showing_horizon = False
+        self.horizon_pause = 3 ## seconds the horizon is shown for in the step by step mode, set by start
+        self.view = None ## visualization.HullView of the step by step mode or a recording, told about every face change
         self.current_point = None
         self.current_horizon = None
-
-        self.get_conflicts(self.points[4:], self.hull.faces)
+        remaining = self.start_hull()
 
         if dis_inc: # If we want to display the incremental hull, rely on .start being called for interactive mode to work
-            self.remaining_points = iter(self.points[4:])
+            self.remaining_points = self.insertion_order(remaining)
         else:
-            for point in self.points[4:]:
+            for point in self.insertion_order(remaining):
                 self.add_point(point)
 
-    def start(self):
+    def start_hull(self):
         """
-        Starts the interactive incremental plotting.
+        Builds the first hull of the rows of self.coords in a new DCEL, the tetrahedron from helpers.initial_simplex with
+        the conflict graph of the other points, or the polygon around them when they are all on one plane (self.flat).
+        Only the corners get a Vertex, the other points stay rows of self.coords until they are inserted (see vertex)
+
+        Raises:
+            ValueError: fewer than 3 points that are not on one line
+
+        Returns:
+            np.ndarray: the indices of the points that are not corners of the first hull, still to be added
         """
-        if not self.dis_inc:
+        self.points = np.full(len(self.coords), None, dtype=object) ## point index: its Vertex, made when it is inserted
+        self.hull = self.dcel()
+        self.conflict_faces = {} ## face: sorted array of the indices of every point that can see it
+        self.conflict_vertices = np.full(len(self.coords), None, dtype=object) ## point index: a face it can see, or None
+        simplex = helpers.initial_simplex(self.coords)
+        if len(simplex) < 3:
+            raise ValueError("A hull needs at least 3 points that are not all on one line.")
+        self.flat = len(simplex) == 3
+        if self.flat: ## every point is on one plane, the hull is the polygon around them
+            normal = np.cross(*(self.coords[simplex[1:]] - self.coords[simplex[0]]))
+            self.hull.create_flat_hull([self.vertex(i) for i in helpers.convex_polygon(self.coords, normal)])
+        else:
+            self.hull.create_tetrahedron(*[self.vertex(i) for i in simplex])
+        remaining = np.setdiff1d(np.arange(len(self.coords)), simplex)
+        if not self.flat: ## on a flat hull nothing is outside, the rest are all inside or corners already
+            faces = list(self.hull.faces)
+            self.get_conflicts([remaining] * len(faces), faces)
+        return remaining
+
+    def vertex(self, index):
+        """
+        The Vertex of a point, made the first time it is needed
+
+        Args:
+            index (int): The index of the point
+
+        Returns:
+            Vertex: the vertex, its index is the index of the point
+        """
+        point = self.points[index]
+        if point is None:
+            point = self.points[index] = Vertex(tuple(self.coords[index].tolist()), index)
+        return point
+
+    def insertion_order(self, points):
+        """
+        The order points that are in the conflict graph are added to the hull in, picked by self.order. A point is only
+        made a Vertex when its turn comes and it is still outside the hull, the ones inside by then are counted and skipped
+
+        Args:
+            points (np.ndarray): the indices of the points to add
+
+        Returns:
+            Iterator[Vertex]: the points to add, one at a time
+        """
+        points = np.asarray(points, dtype=np.intp)
+        if self.order == 'shuffle':
+            points = points[self.rng.permutation(len(points))]
+        elif self.order == 'brio' and len(points) > 1:
+            points = points[helpers.brio_order(self.coords[points], self.rng, self.curve)]
+        return self._outside(points.tolist())
+
+    def _outside(self, indices):
+        """
+        Yields the Vertex of every point that is still outside the hull when its turn comes, see insertion_order
+
+        Args:
+            indices (list[int]): the indices of the points in the order they are added
+
+        Yields:
+            Vertex: the next point to add to the hull
+        """
+        conflicts = self.conflict_vertices
+        for index in indices:
+            if conflicts[index] is not None:
+                yield self.vertex(index)
+            elif self.stats is not None:
+                self.stats.interior += 1
+
+    def add_points(self, points, block = 65536, input_indices = None):
+        """
+        Adds more points to a hull that has already been built, can be called over and over as points arrive.
+        Points inside the current hull are dropped before any Vertex is made for them, the rest are put in the
+        conflict graph and added. Afterwards only the hull vertices are kept (see compact), so memory depends on
+        the size of the hull and not on the number of points added. A flat hull is built again from its corners
+        and the new points, as it may grow within its plane or stop being flat
+
+        Args:
+            points (3 dimensional tuples or np.ndarray): The new points, an (M,3) array of them can be memory mapped
+            block (int, optional): The number of points tested against the hull at a time. Defaults to 65536.
+            input_indices (np.ndarray, optional): The input index of each new point. Defaults to counting on from the
+                points seen so far.
+
+        Raises:
+            ValueError: points that aren't finite, the hull is left as it was
+        """
+        new_coords = (points if isinstance(points, np.ndarray) else np.array(points, dtype=np.float64)).reshape(-1, 3)
+        if not np.isfinite(new_coords).all():
+            raise ValueError("The points must be finite, they hold NaN or infinity.")
+        self.hull_index = None ## the hull is about to change
+        if input_indices is None:
+            input_indices = np.arange(self.points_seen, self.points_seen + len(new_coords))
+        input_indices = np.asarray(input_indices)
+        self.points_seen += len(new_coords)
+        reach = max(self.reach, float(np.abs(new_coords).max(initial=0)))
+        if self.flat: ## the faces of a flat hull can't see points on their plane, build the hull again from scratch
+            self.coords = np.concatenate((self.coords, np.asarray(new_coords, dtype=np.float64)))
+            self.input_indices = np.concatenate((self.input_indices, input_indices))
+            self.reach = reach
+            for point in self.insertion_order(self.start_hull()):
+                self.add_point(point)
+            self.compact()
             return
 
-        plt.ion()
-        self.fig = plt.figure()
-        self.ax = self.fig.add_subplot(111, projection='3d')
-        self.hull.plot(ax=self.ax)
-        self.fig.canvas.mpl_connect('key_press_event', self.on_key_press)
-        self.fig.canvas.mpl_connect('close_event', self.on_close)
-        plt.title("Press Space to add next point")
-        plt.show(block=True) 
+        faces = list(self.hull.faces)
+        normals, offsets = self.hull.get_face_planes(faces)
+        ## points too close to a face to be sure of are kept, get_conflicts settles them exactly
+        offsets = offsets - (self.hull.get_face_errors(faces) * 2 * reach + helpers.PLANE_UNDERFLOW)
+        outside = np.zeros(len(new_coords), dtype=bool)
+        for start in range(0, len(new_coords), block):
+            outside[start:start + block] = helpers.batch_visibility(normals, offsets, new_coords[start:start + block]).any(axis=1)
+        if self.stats is not None:
+            self.stats.visibility_tests += len(new_coords) * len(faces)
+            self.stats.interior += len(new_coords) - int(outside.sum())
+        if not outside.any():
+            return
+
+        first = len(self.coords)
+        added = int(outside.sum())
+        self.points = np.concatenate((self.points, np.full(added, None, dtype=object)))
+        self.coords = np.concatenate((self.coords, np.asarray(new_coords[outside], dtype=np.float64)))
+        self.reach = reach
+        self.input_indices = np.concatenate((self.input_indices, input_indices[outside]))
+        self.conflict_vertices = np.concatenate((self.conflict_vertices, np.full(added, None, dtype=object)))
+
+        new_points = np.arange(first, len(self.coords))
+        self.get_conflicts([new_points] * len(faces), faces)
+        for point in self.insertion_order(new_points):
+            self.add_point(point)
+        self.compact()
+
+    def merge(self, other):
+        """
+        Merges another hull into this one, in place. Only the vertices of the other hull are inserted, with add_points, so
+        the ones inside this hull are dropped in one batched test and the faces of this hull that the other doesn't reach
+        are kept as they are. The input of the merged hull is the input of this hull followed by the input of the other,
+        so the input indices of the other's points are offset by the number of points this hull has seen
+
+        Args:
+            other (RandomIncrementalHull3D): The hull to merge in, it isn't changed
+
+        Returns:
+            RandomIncrementalHull3D: this hull
+        """
+        coords, indices = other.hull_points()
+        seen = self.points_seen
+        self.add_points(coords, input_indices=seen + indices)
+        self.points_seen = seen + other.points_seen
+        return self
+
+    def compact(self):
+        """
+        Drops every point that is not a vertex of the hull faces, from the DCEL and from the points of the object,
+        the kept points are renumbered in order. Only valid once every point has been added, when the conflict graph is empty
+        """
+        on_hull = sorted({vertex.index for face in self.hull.faces for vertex in self.hull.get_face_vertices(face)})
+        keep = np.zeros(len(self.coords), dtype=bool)
+        keep[on_hull] = True
+        for point in self.points[~keep].tolist(): ## only the points that were inserted have a Vertex
+            if point is not None:
+                self.hull.remove_vertex(point)
+
+        self.points = self.points[keep]
+        for i, point in enumerate(self.points.tolist()):
+            point.index = i
+        self.coords = self.coords[keep]
+        self.input_indices = self.input_indices[keep]
+        self.conflict_vertices = np.full(len(self.coords), None, dtype=object)
+
+    @classmethod
+    def stream(cls, chunks, **kwargs):
+        """
+        Builds a hull from chunks of points as they arrive, for example from helpers.read_point_chunks on a file or a socket.
+        The first chunks are buffered until the points span a tetrahedron, the rest are added with add_points.
+        When the whole stream is flat the hull is built from all of it at the end
+
+        Args:
+            chunks (Iterable): chunks of points, each a list of 3 dimensional tuples or an (M,3) array
+            **kwargs: Options passed to the constructor (dcel, prefilter, ...)
+
+        Yields:
+            RandomIncrementalHull3D: the same hull object, up to date after each chunk
+        """
+        hull = None
+        pending = []
+        for chunk in chunks:
+            if hull is not None:
+                hull.add_points(chunk)
+                yield hull
+                continue
+            pending.append(np.array(chunk, dtype=np.float64).reshape(-1, 3))
+            pending = [np.concatenate(pending)]
+            if len(helpers.initial_simplex(pending[0])) == 4: ## wait until the points are not all on one plane
+                hull = cls(pending[0], **kwargs)
+                pending = None
+                yield hull
+        if hull is None and pending and len(helpers.initial_simplex(pending[0])) == 3:
+            yield cls(pending[0], **kwargs)
+
+    def start(self, horizon_pause = 0.5):
+        """
+        Starts the interactive incremental plotting, see visualization.start
+
+        Args:
+            horizon_pause (float, optional): Seconds to show each horizon for, 0 skips it. Defaults to 0.5.
+        """
+        import visualization ## matplotlib is only loaded for the interactive mode
+        visualization.start(self, horizon_pause)
+
+    def record(self, path, **kwargs):
+        """
+        Builds the rest of a hull made with dis_inc=True without a window, recording every step to a GIF, an MP4
+        or numbered PNG frames, see visualization.record
+
+        Args:
+            path (str): The file to write, '.gif', '.mp4' or a pattern like 'frames/%04d.png'
+            **kwargs: passed to visualization.record, for example fps, every, size and dpi
+        """
+        import visualization
+        visualization.record(self, path, **kwargs)
         
     def on_close(self, event):
         """
         Handles the close event for the incremental plotting,
         stops the incremental plotting mode
         """
-        
-        self.dis_inc = False
-        plt.ioff()
-        if self.showing_horizon:
-            self.showing_horizon = False
-            for edge in self.current_horizon:
-                self.new_faces.append(self.hull.create_face([edge.start, edge.end, self.current_point]))
-
-            self.get_conflicts(self.needs_update, self.new_faces)
-                
-            self.needs_update = []
-            self.new_faces = []
-        
-        try:
-            while True:
-                self.current_point = next(self.remaining_points)
-                self.add_point(self.current_point)
-        except StopIteration:
-            pass
+        import visualization
+        visualization.on_close(self, event)
 
     def on_key_press(self, event):
         """
@@ -85,14 +321,8 @@ class RandomIncrementalHull3D:
         Args:
             event (KeyEvent): the matplotlib key press event
         """
-        if event.key == ' ' and not self.showing_horizon:
-            try:
-                self.current_point = next(self.remaining_points)
-                self.add_point(self.current_point)
-                if self.fig: ## might've closed in the add_point
-                    self.redraw()
-            except StopIteration:
-                plt.close(self.fig)
+        import visualization
+        visualization.on_key_press(self, event)
 
     def redraw(self, highlight=None, title=None):
         """
@@ -103,14 +333,8 @@ class RandomIncrementalHull3D:
             highlight (list[Egde], optional): The edges within the hull to highlight, show in red. Defaults to None.
             title (String, optional): The title of the plot. Defaults to None.
         """
-        self.ax.clear()
-        if title:
-            self.ax.set_title(title)
-        else:
-            self.ax.set_title("Press Space to add next point")
-        self.hull.plot(ax=self.ax, highlight=highlight)
-        self.fig.canvas.draw()
-        self.fig.canvas.flush_events()
+        import visualization
+        visualization.redraw(self, highlight, title)
             
     def get_hull(self):
         """
@@ -121,6 +345,98 @@ class RandomIncrementalHull3D:
         """
         return self.hull
 
+    def hull_vertex_indices(self):
+        """
+        Function to get the input indices of the points that are vertices of the hull faces,
+        interior points that were added to the DCEL are left out
+
+        Returns:
+            np.ndarray: the sorted indices into the input points
+        """
+        return self.hull_points()[1]
+
+    def hull_points(self):
+        """
+        Function to get the points that are vertices of the hull faces, all that another hull needs to merge this one
+
+        Returns:
+            tuple: the (V,3) coordinates and the (V,) sorted input indices of the hull vertices
+        """
+        rows = sorted({vertex.index for face in self.hull.faces for vertex in self.hull.get_face_vertices(face)})
+        return self.coords[rows], self.input_indices[rows]
+
+    def validate(self, points = None, **kwargs):
+        """
+        Function to check the hull with helpers.validate_hull, against the points it was built from by default
+
+        Args:
+            points (np.ndarray, optional): The (N,3) points the hull should contain. Defaults to the points of the object,
+                which are only the hull vertices after compact.
+            **kwargs: tolerance, sample, seed and block, see helpers.validate_hull
+
+        Returns:
+            list[str]: a description of every problem found, empty when the hull is valid
+        """
+        return helpers.validate_hull(self.hull, self.coords if points is None else points, **kwargs)
+
+    def contains(self, points, tolerance = 1e-9, block = None):
+        """
+        Function to test which points are inside the hull. Uses the index from build_index if there is one,
+        O(log h) per point, otherwise tests blocks of points against every face at once, O(h) per point
+
+        Args:
+            points (np.ndarray): The (N,3) points to test, can be memory mapped
+            tolerance (float, optional): How far outside a face a point may be and still count as inside,
+                relative to the size of the hull. Defaults to 1e-9.
+            block (int, optional): The number of points tested at a time, see helpers.points_outside.
+
+        Returns:
+            np.ndarray: the (N,) boolean mask of the points inside or on the hull
+        """
+        if self.hull_index is not None:
+            return self.hull_index.contains(points, tolerance, block or 8192)
+        points = np.asarray(points).reshape(-1, 3)
+        inside = np.ones(len(points), dtype=bool)
+        inside[helpers.points_outside(*self.hull.get_face_planes(list(self.hull.faces)), points, tolerance, block)] = False
+        return inside
+
+    def build_index(self, **kwargs):
+        """
+        Function to build a HullIndex (Dobkin-Kirkpatrick hierarchy) of the hull for contains,
+        worth it for hulls with more than a few hundred faces. It is dropped when add_points changes the hull
+
+        Args:
+            **kwargs: max_degree and coarsest, see HullIndex
+
+        Returns:
+            HullIndex: the index, also kept in self.hull_index
+        """
+        from HullIndex import HullIndex ## HullIndex builds its levels with this class
+        vertices, triangles, _ = self.export_mesh()
+        self.hull_index = HullIndex(vertices, triangles, **kwargs)
+        return self.hull_index
+
+    def export_mesh(self):
+        """
+        Function to get the hull as an indexed triangle mesh, with the faces oriented outward
+
+        Returns:
+            tuple: the (V,3) float64 array of hull vertices, the (F,3) int32 array of vertex rows for each face,
+            and the (V,) array of the input index of each hull vertex
+        """
+        coords, triangles, vertices = self.hull.to_arrays()
+        indices = self.input_indices[np.fromiter((vertex.index for vertex in vertices), dtype=np.intp, count=len(vertices))]
+        return np.ascontiguousarray(coords), triangles, indices
+
+    def save(self, path):
+        """
+        Function to write the hull to a mesh file with exporters.write_mesh, the format comes from the extension
+
+        Args:
+            path (str): The file to write, .npy, .npz, .stl or .obj
+        """
+        exporters.write_mesh(path, *self.export_mesh())
+
     def plot(self):
         """
         Function to plot the hull from the Object itself
@@ -129,28 +445,78 @@ class RandomIncrementalHull3D:
         
     def get_conflicts(self, points, faces):
         """
-        A function to update the conlict graph with new faces and vertices
-
-        Args:
-            points (List(Vetex)): The list of points that need new conflict faces
-            faces (List): The list of new faces that replaced the old faces of the above points
-        """
-        points = set(points) ## O(n) for O(1) removal
-        for face in faces:
-            verts = self.hull.get_face_vertices(face)
-            points_to_remove = []
-            for point in points:
-                if helpers.determine_visibility(verts[0], verts[1], verts[2], point):
-                    self.conflict_vertices[point] = face
-                    if face in self.conflict_faces:
-                        self.conflict_faces[face].append(point)
-                    else:
-                        self.conflict_faces[face] = [point]
-                    points_to_remove.append(point)
-            for point in points_to_remove:
-                points.remove(point)
-        for point in points:
-            self.conflict_vertices[point] = None
+        A function to update the conflict graph with new faces, each face is only tested against its own
+        candidate points, all of the tests are done in one batched visibility call against the cached planes.
+        The few tests that are too close to call in floats are redone exactly (see exact_visibility), so every
+        point sees a connected set of faces and the horizon is always a simple cycle
+
+        Args:
+            points (List(np.ndarray)): For each face, the indices of the candidate points that could see it
+            faces (List): The list of new faces to add to the conflict graph
+        """
+        sizes = [len(candidates) for candidates in points]
+        if not sum(sizes):
+            return
+        candidates = np.concatenate(points)
+        owner = np.repeat(np.arange(len(faces)), sizes) ## which face each candidate is tested against
+        normals, offsets = self.hull.get_face_planes(faces)
+        distances = np.einsum('ij,ij->i', self.coords[candidates], normals[owner]) - offsets[owner]
+        visible = distances > 0
+        slack = self.hull.get_face_errors(faces) * 2 * self.reach + helpers.PLANE_UNDERFLOW ## tiny planes can underflow
+        uncertain = np.flatnonzero(np.abs(distances) <= slack[owner])
+        if len(uncertain):
+            visible[uncertain] = self.exact_visibility(faces, owner[uncertain], candidates[uncertain])
+        
+        ## a point can be a candidate of a face twice, sort on (face, point) and drop the repeats
+        keys = np.sort(owner[visible] * len(self.coords) + candidates[visible])
+        first = np.ones(len(keys), dtype=bool)
+        first[1:] = keys[1:] != keys[:-1]
+        keys = keys[first]
+        conflicts = keys % len(self.coords)
+        if self.stats is not None:
+            self.stats.visibility_tests += len(candidates)
+            self.stats.reassigned_points += len(conflicts)
+        bounds = np.searchsorted(keys // len(self.coords), np.arange(len(faces) + 1)) ## conflicts of face i are in bounds[i]:bounds[i+1]
+        for i, face in enumerate(faces):
+            face_conflicts = conflicts[bounds[i]:bounds[i + 1]]
+            if len(face_conflicts):
+                if face in self.conflict_faces: ## an existing face gaining points from add_points, their indices are all larger
+                    face_conflicts = np.concatenate((self.conflict_faces[face], face_conflicts))
+                self.conflict_faces[face] = face_conflicts
+                self.conflict_vertices[face_conflicts] = face
+
+    def exact_visibility(self, faces, owner, candidates):
+        """
+        Tests points against faces with the exact orient3d predicate, for the tests the cached planes can't decide
+
+        Args:
+            faces (list): The faces tested
+            owner (np.ndarray): For each test, the position in faces of the face
+            candidates (np.ndarray): For each test, the index of the point
+
+        Returns:
+            np.ndarray: for each test, true if the point is strictly outside the face
+        """
+        corners = np.array([[vertex.coordinates for vertex in self.hull.get_face_vertices(faces[i])[:3]]
+                            for i in owner.tolist()], dtype=np.float64).reshape(-1, 3, 3)
+        return helpers.orient3d(corners[:, 0], corners[:, 1], corners[:, 2], self.coords[candidates]) > 0
+
+    def in_conflict(self, face, index):
+        """
+        Checks the conflict graph for whether a point can see a face
+
+        Args:
+            face (Face): The face to check
+            index (int): The index of the point to check
+
+        Returns:
+            boolean: True if the point is in the conflict list of the face
+        """
+        conflicts = self.conflict_faces.get(face)
+        if conflicts is None:
+            return False
+        i = conflicts.searchsorted(index)
+        return i < len(conflicts) and conflicts[i] == index
                     
     def add_point(self, point):
         """
@@ -163,26 +529,38 @@ class RandomIncrementalHull3D:
         Returns:
             None: No return type, simply updates the DCEL representing the hull
         """
-        if point not in self.conflict_vertices or self.conflict_vertices[point] is None:
-            self.hull.get_or_create_vertex(point)
+        stats = self.stats
+        face = self.conflict_vertices[point.index]
+        if face is None:
+            if stats is not None:
+                stats.interior += 1
             return ## point is not in conflict, so it is indside the hull
         
-        face = self.conflict_vertices[point]
+        if stats is not None:
+            stats.start(int(self.input_indices[point.index]))
         horizon = self.get_horizon(face, point)
+        if stats is not None:
+            stats.lap('horizon')
         
-        if self.dis_inc: ## show the hull after the horizon is removed
+        if self.dis_inc and self.horizon_pause: ## show the hull after the horizon is removed
             self.showing_horizon = True ## lock on the space key
             self.redraw(highlight=horizon, title="Showing Horizon...")
-            plt.pause(3) ## show horizon for 3 seconds
+            import visualization
+            visualization.pause(self.horizon_pause) ## show horizon for a moment
             if self.showing_horizon: 
                 self.showing_horizon = False
             else: ## resolved earlier when the plot was closed
                 return
         
-        for edge in horizon:
-            self.new_faces.append(self.hull.create_face([edge.start, edge.end, point]))
+        self.new_faces.extend(self.hull.create_cone(horizon, point))
+        if self.view is not None:
+            self.view.faces_added(self.new_faces)
+        if stats is not None:
+            stats.lap('face')
 
         self.get_conflicts(self.needs_update, self.new_faces)
+        if stats is not None:
+            stats.finish(len(horizon))
             
         self.needs_update = []
         self.new_faces = []
@@ -190,58 +568,56 @@ class RandomIncrementalHull3D:
     def get_horizon(self, face, point):
         """
         Finds the horizon of visibility for a given point in the hull and removes the faces within
-        the horizon to prepare for the addition of new faces
+        the horizon to prepare for the addition of new faces.
+        The visible faces are found with the conflict graph, no visibility tests are needed. For every horizon edge,
+        the points that could see the new face built on it are the points in conflict with either of the two faces
+        next to the edge, these are put in self.needs_update in the same order as the horizon
 
         Args:
-            face (Face): The first face found in the visibility graph for the point
+            face (Face): The first face found in the conflict graph for the point
             point (Vertex): The point to add to the hull, to find the horizon of its visibility
 
         Returns:
-            List: A not neccesarly ordered list of edges that form the horizon of the visibility of the point
+            List: The edges that form the horizon of the visibility of the point, in order around the horizon
         """
-        horizon_edges = set()  
-        visited_faces = set()  # explored faces
-        queue = deque()  
-        to_remove = []
+        horizon_edges = []
+        visited_faces = {face}  # explored faces, all visible
+        queue = deque([face])
+        no_conflicts = np.empty(0, dtype=np.intp)
 
-        # Start BFS from first visible face (from conflict graph)
-        queue.append(face)
-        visited_faces.add(face)
+        # Start BFS from the conflict face of the point, stay on faces that have it in their conflict list
         while queue:
             face = queue.popleft()
-            edges = self.hull.get_face_edges(face)
-            visited_count = 0
-            for edge in edges:
+            for edge in self.hull.get_face_edges(face):
                 twin_face = edge.twin.face
-                if twin_face is not None:
-                    p1,p2,p3 = self.hull.get_face_vertices(twin_face)
-                    next_vis = helpers.determine_visibility(p1,p2,p3, point)
-                else:
-                    next_vis = False
-                
-                if twin_face is None or not next_vis:  # It's a boundary edge or we can't see it
-                    horizon_edges.add(edge)
-                    if face in self.conflict_faces:
-                        self.needs_update += self.conflict_faces[face]
-                    to_remove.append(face)
-                    
-                elif twin_face not in visited_faces and next_vis:
+                if twin_face in visited_faces:
+                    continue
+                if twin_face is not None and self.in_conflict(twin_face, point.index):
                     queue.append(twin_face)
                     visited_faces.add(twin_face)
-                    if face in self.conflict_faces:
-                        self.needs_update += self.conflict_faces[face]
-                    to_remove.append(face)
-                else:
-                    visited_count += 1
-                    if visited_count == 3: # stranded face
-                        if face in self.conflict_faces:
-                            self.needs_update += self.conflict_faces[face]
-                        to_remove.append(face)
-            
-        for face in to_remove:
-            if face in self.conflict_faces:
-                del self.conflict_faces[face]
+                else: # It's a boundary edge or we can't see past it
+                    horizon_edges.append(edge)
+        horizon_edges = self.hull.horizon_cycle(horizon_edges[0], len(horizon_edges), visited_faces) ## a disk, the tests are exact
+
+        ## points that only saw removed faces have no conflict face until get_conflicts gives them a new one
+        for face in visited_faces:
+            self.conflict_vertices[self.conflict_faces.get(face, no_conflicts)] = None
+
+        for edge in horizon_edges:
+            twin_face = edge.twin.face
+            twin_conflicts = self.conflict_faces.get(twin_face, no_conflicts)
+            candidates = np.concatenate((self.conflict_faces.get(edge.face, no_conflicts), twin_conflicts))
+            self.needs_update.append(candidates[candidates != point.index])
+            self.conflict_vertices[twin_conflicts] = twin_face ## a point that can still see across the horizon keeps that face
+
+        if self.view is not None: ## before the faces are gone, an ArrayDCEL reuses their numbers
+            self.view.faces_removed(visited_faces, horizon_edges, point)
+        for face in visited_faces:
+            self.conflict_faces.pop(face, None)
             self.hull.remove_face(face)
+        if self.stats is not None:
+            self.stats.faces_removed += len(visited_faces)
+        self.conflict_vertices[point.index] = None
             
-        self.current_horizon = list(horizon_edges)
-        return self.current_horizon 
\ No newline at end of file
+        self.current_horizon = horizon_edges
+        return self.current_horizon
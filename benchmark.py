@@ -0,0 +1,225 @@
+"""
+Benchmark suite for the hull engines. Every case is generated from a fixed seed, timed with perf_counter after
+warmup runs and measured for peak memory with tracemalloc, and the results are written as JSON so two commits
+can be compared with compare().
+
+    python benchmark.py run --out before.json
+    python benchmark.py run --out after.json
+    python benchmark.py compare before.json after.json
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from engines import DCELS, ENGINES
+from RandomIncHull import RandomIncrementalHull3D
+
+def cube_points(n, rng):
+    """
+    Uniform points in the unit cube, the hull has O(log^2 n) vertices
+    """
+    return rng.random((n, 3))
+
+def ball_points(n, rng):
+    """
+    Uniform points in the unit ball, the hull has O(n^(1/3)) vertices
+    """
+    directions = sphere_points(n, rng)
+    return directions * rng.random((n, 1)) ** (1 / 3)
+
+def sphere_points(n, rng):
+    """
+    Points on the unit sphere, every point is a hull vertex (h = n), the worst case
+    """
+    points = rng.normal(size=(n, 3))
+    return points / np.linalg.norm(points, axis=1, keepdims=True)
+
+def cluster_points(n, rng, clusters=8, spread=0.05):
+    """
+    Gaussian clusters around centers picked in the unit cube
+    """
+    centers = rng.random((clusters, 3))
+    return centers[rng.integers(clusters, size=n)] + rng.normal(scale=spread, size=(n, 3))
+
+def slab_points(n, rng, thickness=1e-6):
+    """
+    Uniform points in a thin tilted slab, nearly coplanar, so the plane tests work close to their rounding error
+    """
+    points = rng.random((n, 3)) * (1, 1, thickness)
+    tilt = np.array([[1, 0, 0], [0, 0.6, -0.8], [0, 0.8, 0.6]]) ## rotate the slab off the axes
+    return points @ tilt.T
+
+DISTRIBUTIONS = {'cube': cube_points, 'ball': ball_points, 'sphere': sphere_points,
+                 'clusters': cluster_points, 'slab': slab_points}
+
+def benchmark_case(distribution, n, engine=RandomIncrementalHull3D, repeats=5, warmup=1, seed=0, **kwargs):
+    """
+    Times one engine on one distribution and size, the points are the same for every run and every commit
+
+    Args:
+        distribution (str): The name of the distribution in DISTRIBUTIONS
+        n (int): The number of points
+        engine (class, optional): The hull class to build. Defaults to RandomIncrementalHull3D.
+        repeats (int, optional): The number of timed runs. Defaults to 5.
+        warmup (int, optional): The number of untimed runs first. Defaults to 1.
+        seed (int, optional): The seed of the point generator, and of the insertion order unless kwargs has its own.
+            Defaults to 0.
+        **kwargs: passed to the engine, for example dcel=ArrayDCEL or prefilter=True
+
+    Returns:
+        dict: the times of every run in seconds, their best and median, the peak traced memory in bytes
+        and the number of hull faces
+    """
+    points = DISTRIBUTIONS[distribution](n, np.random.default_rng(seed))
+    kwargs.setdefault('seed', seed) ## the same insertion order in every run, so only the code changes the times
+    for _ in range(warmup):
+        engine(points, **kwargs)
+
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        hull = engine(points, **kwargs)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start() ## separate run, tracing slows the build down
+    engine(points, **kwargs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {'distribution': distribution, 'n': n, 'seed': seed, 'times': times, 'best': min(times),
+            'median': statistics.median(times), 'peak_memory': peak, 'faces': len(hull.get_hull().faces)}
+
+def run_benchmark(distributions=tuple(DISTRIBUTIONS), n_values=(1000, 10000, 50000), engine='random', dcel='object',
+                  repeats=5, warmup=1, seed=0, prefilter=False, verbose=True):
+    """
+    Runs every distribution at every size
+
+    Args:
+        distributions (list[str], optional): The distributions to run. Defaults to all of DISTRIBUTIONS.
+        n_values (list[int], optional): The sizes to run. Defaults to (1000, 10000, 50000).
+        engine (str, optional): The engine in ENGINES. Defaults to 'random'.
+        dcel (str, optional): The DCEL in DCELS. Defaults to 'object'.
+        repeats (int, optional): The number of timed runs per case. Defaults to 5.
+        warmup (int, optional): The number of untimed runs per case. Defaults to 1.
+        seed (int, optional): The seed of the point generator and of the insertion order. Defaults to 0.
+        prefilter (bool, optional): Passed to the engine. Defaults to False.
+        verbose (bool, optional): Print each case as it finishes. Defaults to True.
+
+    Returns:
+        dict: the settings and environment under 'meta' and one entry per case under 'results', ready for json
+    """
+    meta = {'engine': engine, 'dcel': dcel, 'prefilter': prefilter, 'repeats': repeats, 'warmup': warmup,
+            'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.platform(),
+            'commit': _git_commit()}
+    results = []
+    for distribution in distributions:
+        for n in n_values:
+            result = benchmark_case(distribution, n, ENGINES[engine], repeats, warmup, seed,
+                                    dcel=DCELS[dcel], prefilter=prefilter)
+            results.append(result)
+            if verbose:
+                print(f"{distribution:>8} n = {n:7d} | median = {result['median']:.4f} sec | best = {result['best']:.4f} sec"
+                      f" | peak = {result['peak_memory'] / 2**20:8.2f} MiB | faces = {result['faces']}")
+    return {'meta': meta, 'results': results}
+
+SETTINGS = ('engine', 'dcel', 'prefilter') ## meta keys two runs must share to be compared
+
+def compare(baseline, current, threshold=0.10, verbose=True):
+    """
+    Compares two benchmark runs case by case and flags every case that got slower or used more memory.
+    Only runs of the same engine, DCEL and prefilter are compared, and only cases of the same seed
+
+    Args:
+        baseline (dict): The older run_benchmark result
+        current (dict): The newer run_benchmark result
+        threshold (float, optional): The allowed relative increase. Defaults to 0.10.
+        verbose (bool, optional): Print a line for every case. Defaults to True.
+
+    Raises:
+        ValueError: the runs used a different engine, DCEL or prefilter
+
+    Returns:
+        list[dict]: the regressions, with the case, the metric and both values
+    """
+    mismatched = [key for key in SETTINGS if baseline['meta'].get(key) != current['meta'].get(key)]
+    if mismatched:
+        raise ValueError('The runs can\'t be compared, they differ in ' + ', '.join(
+            f"{key} ({baseline['meta'].get(key)!r} and {current['meta'].get(key)!r})" for key in mismatched))
+    before = {(result['distribution'], result['n']): result for result in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        key = (result['distribution'], result['n'])
+        if key not in before:
+            continue
+        if result['seed'] != before[key]['seed']: ## different points, the numbers say nothing about the code
+            if verbose:
+                print(f"{key[0]:>8} n = {key[1]:7d} | seeds {before[key]['seed']} and {result['seed']} differ, skipped")
+            continue
+        for metric in ('median', 'peak_memory'):
+            ratio = result[metric] / before[key][metric] if before[key][metric] else 1.0
+            flagged = ratio > 1 + threshold
+            if flagged:
+                regressions.append({'distribution': key[0], 'n': key[1], 'metric': metric,
+                                    'baseline': before[key][metric], 'current': result[metric], 'ratio': ratio})
+            if verbose:
+                print(f"{key[0]:>8} n = {key[1]:7d} | {metric:>11} x{ratio:.3f}{'  REGRESSION' if flagged else ''}")
+    return regressions
+
+def _git_commit():
+    """
+    The commit being benchmarked, None outside a git checkout
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv=None):
+    """
+    Command line entry point, 'run' writes a JSON result, 'compare' exits with 1 when there is a regression
+    and with 2 when the runs can't be compared
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the convex hull engines.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run = commands.add_parser('run')
+    run.add_argument('--out', default='benchmark.json')
+    run.add_argument('--distributions', nargs='+', choices=list(DISTRIBUTIONS), default=list(DISTRIBUTIONS))
+    run.add_argument('--n', nargs='+', type=int, default=[1000, 10000, 50000])
+    run.add_argument('--engine', choices=list(ENGINES), default='random')
+    run.add_argument('--dcel', choices=list(DCELS), default='object')
+    run.add_argument('--repeats', type=int, default=5)
+    run.add_argument('--warmup', type=int, default=1)
+    run.add_argument('--seed', type=int, default=0)
+    run.add_argument('--prefilter', action='store_true')
+    check = commands.add_parser('compare')
+    check.add_argument('baseline')
+    check.add_argument('current')
+    check.add_argument('--threshold', type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        results = run_benchmark(args.distributions, args.n, args.engine, args.dcel, args.repeats, args.warmup,
+                                args.seed, args.prefilter)
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    try:
+        return 1 if compare(baseline, current, args.threshold) else 0
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 2
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,11 @@
+"""
+The hull engines and DCELs by name, for the command line, the benchmark suite, the batch pipeline and the service,
+which all pick them from a string.
+"""
+from ArrayDCEL import ArrayDCEL
+from DCEL import DCEL
+from QuickHull import QuickHull3D
+from RandomIncHull import RandomIncrementalHull3D
+
+ENGINES = {'random': RandomIncrementalHull3D, 'quick': QuickHull3D}
+DCELS = {'object': DCEL, 'array': ArrayDCEL}
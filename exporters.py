@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+
+## one binary STL triangle, 50 bytes
+STL_TRIANGLE = np.dtype([('normal', '<f4', (3,)), ('vertices', '<f4', (3, 3)), ('attributes', '<u2')])
+
+def write_mesh(path, vertices, triangles, input_indices=None):
+    """
+    Writes an indexed triangle mesh, picking the format from the extension
+
+    Args:
+        path (str): The file to write, .npy, .npz, .stl or .obj
+        vertices (np.ndarray): The (V,3) array of vertex coordinates
+        triangles (np.ndarray): The (F,3) array of vertex rows for each face
+        input_indices (np.ndarray, optional): The (V,) input index of each vertex, kept by .npy and .npz. Defaults to None.
+
+    Raises:
+        ValueError: the extension isn't one of the supported formats
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.npy':
+        write_npy(path, vertices, triangles, input_indices)
+    elif extension == '.npz':
+        np.savez(path, vertices=vertices, triangles=triangles,
+                 **({} if input_indices is None else {'input_indices': input_indices}))
+    elif extension == '.stl':
+        write_stl(path, vertices, triangles)
+    elif extension == '.obj':
+        write_obj(path, vertices, triangles)
+    else:
+        raise ValueError(f"Can't write a mesh to {path}, use .npy, .npz, .stl or .obj.")
+
+def write_npy(path, vertices, triangles, input_indices=None):
+    """
+    Writes each array to its own .npy file next to path, name_vertices.npy, name_triangles.npy and name_indices.npy,
+    so they can be memory mapped back with np.load
+
+    Args:
+        path (str): The .npy path to name the files after
+        vertices (np.ndarray): The (V,3) array of vertex coordinates
+        triangles (np.ndarray): The (F,3) array of vertex rows for each face
+        input_indices (np.ndarray, optional): The (V,) input index of each vertex. Defaults to None.
+    """
+    stem = os.path.splitext(path)[0]
+    np.save(stem + '_vertices.npy', vertices)
+    np.save(stem + '_triangles.npy', triangles)
+    if input_indices is not None:
+        np.save(stem + '_indices.npy', input_indices)
+
+def write_stl(path, vertices, triangles):
+    """
+    Writes a binary STL file, the records are filled in with array operations and written in one call
+
+    Args:
+        path (str): The file to write
+        vertices (np.ndarray): The (V,3) array of vertex coordinates
+        triangles (np.ndarray): The (F,3) array of vertex rows for each face, counter clockwise seen from outside
+    """
+    corners = vertices[triangles]
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    
+    records = np.zeros(len(triangles), dtype=STL_TRIANGLE)
+    records['normal'] = np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+    records['vertices'] = corners
+    with open(path, 'wb') as f:
+        f.write(b'3dconvexHull'.ljust(80, b' '))
+        f.write(np.uint32(len(triangles)).astype('<u4').tobytes())
+        f.write(records.tobytes())
+
+def write_obj(path, vertices, triangles):
+    """
+    Writes a Wavefront OBJ file, faces use 1 based vertex numbers
+
+    Args:
+        path (str): The file to write
+        vertices (np.ndarray): The (V,3) array of vertex coordinates
+        triangles (np.ndarray): The (F,3) array of vertex rows for each face
+    """
+    with open(path, 'w') as f:
+        np.savetxt(f, vertices, fmt='v %.17g %.17g %.17g')
+        np.savetxt(f, np.asarray(triangles) + 1, fmt='f %d %d %d')
@@ -1,7 +1,11 @@
+import itertools
+import math
 import random
+from fractions import Fraction
+
 import numpy as np
-import matplotlib.pyplot as plt
-from mpl_toolkits.mplot3d.art3d import Poly3DCollection
+
+EPSILON = np.finfo(np.float64).eps / 2 ## unit roundoff of a float64
 
 # Define the vector class
 class Vector:
@@ -32,9 +36,14 @@ class Vector:
     def __str__(self):
         return f"({self.x}, {self.y}, {self.z})"
 
+ORIENT_ERROR = (7 + 56 * EPSILON) * EPSILON ## Shewchuk's bound on the rounding error of a float orient3d, relative to its permanent
+PLANE_ERROR = 10 * EPSILON ## bound on the rounding error of a cached plane test, see face_plane
+UNDERFLOW = np.finfo(np.float64).smallest_subnormal ## the absolute error of a product that underflows
+PLANE_UNDERFLOW = 2.0 ** -1000 ## plane tests closer to 0 than this may have underflowed, they are redone exactly
+
 def determine_visibility(p1, p2, p3, q):
     """
-    Function used to test if a point is visible from a face
+    Function used to test if a point is visible from a face, exactly, with orient3d
 
     Args:
         p1 (Vertex): A vertex on the face
@@ -45,128 +54,631 @@ def determine_visibility(p1, p2, p3, q):
     Returns:
         boolean: true or false depending on the visibility of the point
     """
+    return orient3d(*[(p.x, p.y, p.z) for p in (p1, p2, p3, q)])[0] > 0 ## if the orientation is positive, the point is visible
+
+def orient3d(a, b, c, d):
+    """
+    The sign of (d - a) . ((b - a) x (c - a)), positive when d is on the side of the plane through a, b and c
+    that the counter clockwise face a, b, c faces. Every determinant is computed in floats first and only the ones
+    within Shewchuk's static error bound of zero are recomputed exactly, so the sign is always right and
+    almost all of the cost is the float pass
+
+    Args:
+        a (np.ndarray): The (3,) or (N,3) first corners of the faces
+        b (np.ndarray): The (3,) or (N,3) second corners
+        c (np.ndarray): The (3,) or (N,3) third corners
+        d (np.ndarray): The (3,) or (N,3) points to query
+
+    Returns:
+        np.ndarray: the (N,) signs, -1, 0 or 1, as int8
+    """
+    a, b, c, d = np.broadcast_arrays(*[np.asarray(p, dtype=np.float64).reshape(-1, 3) for p in (a, b, c, d)])
+    u, v, w = b - a, c - a, d - a
+    uv = u[:, [1, 2, 0]] * v[:, [2, 0, 1]] ## the two products of every component of the cross product
+    vu = u[:, [2, 0, 1]] * v[:, [1, 2, 0]]
+    det = np.einsum('ij,ij->i', w, uv - vu)
+    permanent = np.einsum('ij,ij->i', np.abs(w), np.abs(uv) + np.abs(vu))
+    if not np.isfinite(a).all() or not np.isfinite(b).all() or not np.isfinite(c).all() or not np.isfinite(d).all():
+        raise ValueError("orient3d needs finite coordinates.")
+    ## a term of det that has two nonzero factors is not exactly 0 even when it underflows to 0 in floats
+    possible = (w != 0) & (((u[:, [1, 2, 0]] != 0) & (v[:, [2, 0, 1]] != 0)) | ((u[:, [2, 0, 1]] != 0) & (v[:, [1, 2, 0]] != 0)))
+    ## the relative bound doesn't cover products that underflow, each of them is off by up to UNDERFLOW times |w|
+    slack = ORIENT_ERROR * permanent + 8 * UNDERFLOW * (1 + np.abs(w).sum(axis=1))
+    uncertain = np.flatnonzero(((np.abs(det) <= slack) & possible.any(axis=1)) | ~np.isfinite(det)) ## overflow is redone exactly too
+    signs = np.sign(np.nan_to_num(det)).astype(np.int8)
+    for i in uncertain.tolist():
+        signs[i] = orient3d_exact(a[i], b[i], c[i], d[i])
+    return signs
+
+def orient3d_exact(a, b, c, d):
+    """
+    orient3d for one face and point in exact rational arithmetic, every float converts to a Fraction without rounding
+
+    Args:
+        a (np.ndarray): The (3,) first corner of the face
+        b (np.ndarray): The (3,) second corner
+        c (np.ndarray): The (3,) third corner
+        d (np.ndarray): The (3,) point to query
+
+    Returns:
+        int: the sign, -1, 0 or 1
+    """
+    a, b, c, d = [[Fraction(x) for x in np.asarray(p, dtype=np.float64).tolist()] for p in (a, b, c, d)]
+    u = [b[i] - a[i] for i in range(3)]
+    v = [c[i] - a[i] for i in range(3)]
+    w = [d[i] - a[i] for i in range(3)]
+    det = (w[0] * (u[1] * v[2] - u[2] * v[1]) + w[1] * (u[2] * v[0] - u[0] * v[2]) + w[2] * (u[0] * v[1] - u[1] * v[0]))
+    return (det > 0) - (det < 0)
+
+def face_plane(p1, p2, p3):
+    """
+    Function used to compute the supporting plane of a face, so it can be cached with the face
+    and reused for every visibility test against it. The plane is rounded, so a test normal . q - offset is only
+    trusted when it is further from zero than error * (max |q| + max |p1|), with max the largest absolute coordinate,
+    closer tests are redone exactly with orient3d
+
+    Args:
+        p1 (Vertex): A vertex on the face
+        p2 (Vertex): A vertex on the face
+        p3 (Vertex): A vertex on the face
+
+    Raises:
+        ValueError: the plane overflows, the coordinates are too large or not finite
+
+    Returns:
+        tuple: the outward normal (x, y, z) of the face, its offset, a point q is visible when normal . q > offset,
+        and the error weight of the plane
+    """
     v1 = Vector(p2.x - p1.x, p2.y - p1.y, p2.z - p1.z) ## vector from p1 to p2
     v2 = Vector(p3.x - p1.x, p3.y - p1.y, p3.z - p1.z) ## vector from p1 to p3
     
     normal_vector = v1.cross_product(v2) ## normal vector to the plane
-    query_vector = Vector(q.x - p1.x, q.y - p1.y, q.z - p1.z)
-    
-    dot_product = query_vector.dot_product(normal_vector) 
-    return dot_product > 0 ## if the dot product is positive, the point is visible
+    offset = normal_vector.x * p1.x + normal_vector.y * p1.y + normal_vector.z * p1.z
+    ## the rounding of each normal component is bounded by its two products, the dot products add |normal|
+    error = PLANE_ERROR * (abs(v1.y * v2.z) + abs(v1.z * v2.y) + abs(v1.z * v2.x) + abs(v1.x * v2.z) + abs(v1.x * v2.y)
+                           + abs(v1.y * v2.x) + abs(normal_vector.x) + abs(normal_vector.y) + abs(normal_vector.z))
+    if not (math.isfinite(offset) and math.isfinite(error)):
+        raise ValueError("The plane of a face overflows, the coordinates are too large or not finite.")
+    return (normal_vector.x, normal_vector.y, normal_vector.z), offset, error
+
+def plane_visibility(normal, offset, q):
+    """
+    Function used to test if a point is visible from a face, using the face's cached plane
+
+    Args:
+        normal (tuple): The outward normal of the face
+        offset (float): The offset of the face plane
+        q (Vertex): The point to query
+
+    Returns:
+        boolean: true or false depending on the visibility of the point
+    """
+    return normal[0] * q.x + normal[1] * q.y + normal[2] * q.z > offset
+
+def batch_visibility(normals, offsets, points):
+    """
+    Function used to test many points against one face, or against many faces, in one NumPy call
+
+    Args:
+        normals (np.ndarray): The (3,) normal of one face, or the (F,3) normals of F faces
+        offsets (float or np.ndarray): The offset of the face, or the (F,) offsets of the faces
+        points (np.ndarray): The (N,3) array of points to query
+
+    Returns:
+        np.ndarray: (N,) booleans for one face, or (N,F) booleans for many faces, true where the point is visible
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    normals = np.asarray(normals, dtype=np.float64)
+    return points @ normals.T > offsets
 
-def oriented_face(points, centroid): 
+def oriented_face(points, opposite):
     """
     Used to ensure the faces of the initial tetrahedron are oriented correctly, ie, normals are pointing outward
 
     Args:
         points (list[Vertex]): the list of points that form the face
-        centroid (float): the centroid of the entire tetrahedron, a point strictly inside the tetrahedron
+        opposite (Vertex): the corner of the tetrahedron that is not on the face, it has to end up behind the face
 
     Returns:
         list[Vertex]: the list of points that form the face in the correct orientation
     """
-    ## used to ensure that our initial tetrhedron is oriented correctly
-    face_centroid = Vector((points[0].x + points[1].x + points[2].x) / 3.0, (points[0].y + points[1].y + points[2].y) / 3.0, (points[0].z + points[1].z + points[2].z) / 3.0) 
-    
-    v1 = Vector(points[1].x - points[0].x, points[1].y - points[0].y, points[1].z - points[0].z)
-    v2 = Vector(points[2].x - points[0].x, points[2].y - points[0].y, points[2].z - points[0].z)
-    
-    normal = v1.cross_product(v2)
-    
-    # make a vector from the tetrahedron centroid to the face centroid
-    direction = Vector(face_centroid.x - centroid.x, face_centroid.y - centroid.y, face_centroid.z - centroid.z)
-    
-    # If the dot product is negative, the normal is pointing inward, so flip the direction
-    if normal.dot_product(direction) < 0:
+    ## the exact orientation, so a very flat tetrahedron is oriented correctly too
+    if orient3d(*[(p.x, p.y, p.z) for p in (*points, opposite)])[0] > 0: ## the opposite corner is in front, flip the face
         points = [points[0], points[2], points[1]]
     return points
 
+def initial_simplex(points, tolerance=1e-10):
+    """
+    Picks the points of the first tetrahedron from the extremes of the input, so it is as fat as possible:
+    the lowest and highest point along the longest axis, the point farthest from the line between them,
+    and the point farthest from the plane of those three. Stops early when the input is degenerate.
+    The input is only called flat when orient3d finds every point exactly on the plane, points that are nearly
+    flat still get a (thin) tetrahedron, as a flat hull would leave the points just off the plane outside of it
+
+    The distances are measured on the points scaled to unit size, so the tests work at any scale
+
+    Args:
+        points (np.ndarray): The (N,3) points
+        tolerance (float, optional): How far from the line a point must be to count, relative to the
+            size of the input, and how far from the plane a point must be to skip the exact test. Defaults to 1e-10.
+
+    Returns:
+        list[int]: four indices for a proper tetrahedron, three if the points are all coplanar,
+        two if they are collinear, one if they are all the same point and none if there are no points
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    if not len(points):
+        return []
+    extent = np.ptp(points, axis=0)
+    axis = int(extent.argmax())
+    first, second = int(points[:, axis].argmin()), int(points[:, axis].argmax())
+    if extent[axis] == 0:
+        return [first]
+    offsets = (points - points[first]) / extent[axis] ## the size of the input is 1, so nothing below can underflow or overflow
+    line = offsets[second]
+    slack = tolerance
+    distances = np.linalg.norm(np.cross(offsets, line), axis=1) / np.linalg.norm(line)
+    third = int(distances.argmax())
+    if distances[third] <= slack:
+        return [first, second]
+
+    normal = np.cross(line, offsets[third])
+    heights = np.abs(offsets @ normal) / np.linalg.norm(normal)
+    fourth = int(heights.argmax())
+    if heights[fourth] <= slack:
+        off_plane = orient3d(points[first], points[second], points[third], points) != 0
+        if not off_plane.any():
+            return [first, second, third]
+        fourth = int(np.flatnonzero(off_plane)[heights[off_plane].argmax()])
+    return [first, second, third, fourth]
+
+def convex_polygon(points, normal):
+    """
+    The convex hull of coplanar points (Andrew's monotone chain), used when the whole input is flat
+
+    Args:
+        points (np.ndarray): The (N,3) points, all on one plane
+        normal (np.ndarray): The normal of the plane, the polygon is counter clockwise seen from its side
+
+    Returns:
+        list[int]: the indices of the corners of the polygon in counter clockwise order, no three on a line
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    normal = np.asarray(normal, dtype=np.float64)
+    u = np.cross(normal, np.eye(3)[np.abs(normal).argmin()])
+    v = np.cross(normal, u) ## (u, v, normal) is right handed, so counter clockwise in (u, v) is counter clockwise around normal
+    flat = np.stack((points @ u, points @ v), axis=1)
+    order = np.lexsort((flat[:, 1], flat[:, 0])).tolist()
+
+    def turn(o, a, b):
+        return (flat[a, 0] - flat[o, 0]) * (flat[b, 1] - flat[o, 1]) - (flat[a, 1] - flat[o, 1]) * (flat[b, 0] - flat[o, 0])
+
+    lower, upper = [], []
+    for chain, indices in ((lower, order), (upper, order[::-1])):
+        for i in indices:
+            while len(chain) >= 2 and turn(chain[-2], chain[-1], i) <= 0:
+                chain.pop()
+            chain.append(i)
+    return lower[:-1] + upper[:-1]
+
+## directions used to find extreme points for the prefilter, the 6 axes and the 8 diagonals
+FILTER_DIRECTIONS = np.array([d for d in itertools.product((-1, 0, 1), repeat=3) if np.count_nonzero(d) in (1, 3)], dtype=np.float64)
+
+def extreme_points(points, directions=FILTER_DIRECTIONS, block=65536):
+    """
+    Finds the point farthest along each direction, in blocks so the projections stay small
+
+    Args:
+        points (np.ndarray): The (N,3) array of points
+        directions (np.ndarray, optional): The (D,3) array of directions. Defaults to FILTER_DIRECTIONS.
+        block (int, optional): The most points projected at a time, fewer for many directions. Defaults to 65536.
+
+    Returns:
+        np.ndarray: the sorted indices of the extreme points, without repeats
+    """
+    best = np.full(len(directions), -np.inf)
+    best_index = np.zeros(len(directions), dtype=np.intp)
+    block = max(1, min(block, (1 << 24) // max(len(directions), 1))) ## at most 16 million projections at a time
+    for start in range(0, len(points), block):
+        projections = directions @ np.asarray(points[start:start + block]).T ## a row per direction, argmax runs along rows
+        arg = projections.argmax(axis=1)
+        value = projections[np.arange(len(directions)), arg]
+        better = value > best
+        best[better] = value[better]
+        best_index[better] = arg[better] + start
+    return np.unique(best_index)
+
+def polytope_planes(points, tolerance=1e-9):
+    """
+    Finds the outward facing planes of the convex hull of a handful of points by brute force,
+    every triple of points whose plane has all of the points on one side is a facet
+
+    Args:
+        points (np.ndarray): The (M,3) array of points, M should be small as this is O(M^4)
+        tolerance (float, optional): How far past a plane a point can be, relative to the size of the points. Defaults to 1e-9.
+
+    Returns:
+        tuple: the (F,3) array of normals and the (F,) array of offsets, empty if the points are all coplanar
+    """
+    triples = np.array(list(itertools.combinations(range(len(points)), 3)), dtype=np.intp).reshape(-1, 3)
+    p1, p2, p3 = points[triples[:, 0]], points[triples[:, 1]], points[triples[:, 2]]
+    normals = np.cross(p2 - p1, p3 - p1)
+    lengths = np.linalg.norm(normals, axis=1)
+    scale = np.ptp(points, axis=0).max() if len(points) else 0.0
+    
+    normals, p1, lengths = normals[lengths > 0], p1[lengths > 0], lengths[lengths > 0] ## skip collinear triples
+    offsets = np.einsum('ij,ij->i', normals, p1)
+    side = points @ normals.T - offsets
+    slack = tolerance * scale * lengths
+    outward = (side <= slack).all(axis=0)
+    inward = (side >= -slack).all(axis=0)
+    if (outward & inward).any(): ## every point is on the plane, there is no volume to filter with
+        return np.empty((0, 3)), np.empty(0)
+    return np.concatenate((normals[outward], -normals[inward])), np.concatenate((offsets[outward], -offsets[inward]))
+
+def akl_toussaint_filter(points, tolerance=1e-9, block=65536):
+    """
+    Akl-Toussaint heuristic, finds the extreme points along the axes and diagonals, and marks every point strictly
+    inside of their polytope, those points can't be on the convex hull. Done in blocks of vectorized plane tests
+
+    Args:
+        points (np.ndarray): The (N,3) array of points, can be memory mapped
+        tolerance (float, optional): How far inside the polytope a point has to be to be dropped, relative to the size
+            of the polytope. Defaults to 1e-9.
+        block (int, optional): The number of points tested at a time. Defaults to 65536.
+
+    Returns:
+        np.ndarray: (N,) booleans, false for the points that can be dropped
+    """
+    points = np.asarray(points).reshape(-1, 3) ## no copy for memory mapped points, each block is read on its own
+    keep = np.ones(len(points), dtype=bool)
+    extremes = np.asarray(points[extreme_points(points, block=block)], dtype=np.float64)
+    if len(extremes) < 4:
+        return keep
+    normals, offsets = polytope_planes(extremes, tolerance)
+    if not len(normals):
+        return keep
+    
+    slack = tolerance * np.ptp(extremes, axis=0).max() * np.linalg.norm(normals, axis=1)
+    for start in range(0, len(points), block):
+        inside = (points[start:start + block] @ normals.T - offsets < -slack).all(axis=1)
+        keep[start:start + block] = ~inside
+    return keep
+
+def sphere_directions(count):
+    """
+    Spreads unit directions evenly over the sphere on a Fibonacci lattice, every direction on the sphere is within
+    about 2.8 / sqrt(count) radians of one of them
+
+    Args:
+        count (int): The number of directions
+
+    Returns:
+        np.ndarray: the (count,3) unit directions
+    """
+    heights = 1 - (2 * np.arange(count) + 1) / count
+    radii = np.sqrt(1 - heights ** 2)
+    angles = np.arange(count) * np.pi * (3 - np.sqrt(5)) ## the golden angle
+    return np.column_stack((radii * np.cos(angles), radii * np.sin(angles), heights))
+
+def grid_extremes(points, low, cell, shape, axis=2, block=65536):
+    """
+    Finds the lowest and the highest point along an axis in every column of a grid of square cells across the other two
+    axes, in blocks: each block is sorted by column and height once and merged into the running extremes of the grid
+
+    Args:
+        points (np.ndarray): The (N,3) array of points, can be memory mapped
+        low (np.ndarray): The (3,) lowest corner of the points
+        cell (float): The side of a cell
+        shape (tuple): The number of cells along the two other axes, in order
+        axis (int, optional): The axis of the columns. Defaults to 2.
+        block (int, optional): The number of points sorted at a time. Defaults to 65536.
+
+    Returns:
+        tuple: the sorted indices of the extreme points without repeats, and the lowest and highest height of every
+        column as two arrays of the grid shape, inf and -inf for empty columns
+    """
+    others = [other for other in range(3) if other != axis]
+    lowest = np.full(shape[0] * shape[1], np.inf)
+    highest = np.full(shape[0] * shape[1], -np.inf)
+    lowest_index = np.full(len(lowest), -1, dtype=np.intp)
+    highest_index = np.full(len(highest), -1, dtype=np.intp)
+    for start in range(0, len(points), block):
+        chunk = np.asarray(points[start:start + block], dtype=np.float64)
+        cells = np.floor((chunk[:, others] - low[others]) / cell).astype(np.intp)
+        np.clip(cells, 0, np.array(shape) - 1, out=cells) ## the points on the far side of the grid
+        columns = cells[:, 0] * shape[1] + cells[:, 1]
+        order = np.lexsort((chunk[:, axis], columns))
+        columns = columns[order]
+        first = np.flatnonzero(np.r_[True, columns[1:] != columns[:-1]])
+        last = np.r_[first[1:] - 1, len(order) - 1]
+        for ends, extreme, extreme_index, better in ((first, lowest, lowest_index, np.less),
+                                                     (last, highest, highest_index, np.greater)):
+            column, index = columns[ends], order[ends]
+            height = chunk[index, axis]
+            update = better(height, extreme[column])
+            extreme[column[update]] = height[update]
+            extreme_index[column[update]] = index[update] + start
+    indices = np.unique(np.concatenate((lowest_index, highest_index)))
+    return indices[indices >= 0], lowest.reshape(shape), highest.reshape(shape)
+
+def read_point_chunks(stream, chunk_size=65536):
+    """
+    Reads points from a binary stream of little endian float64 (x, y, z) triples, such as a file opened with 'rb'
+    or socket.makefile('rb'), a chunk at a time so the whole input is never in memory
+
+    Args:
+        stream (file): The binary stream to read from
+        chunk_size (int, optional): The number of points per chunk. Defaults to 65536.
+
+    Yields:
+        np.ndarray: (M,3) arrays of points, M is chunk_size except for the last chunk
+    """
+    point_size = 3 * 8
+    leftover = b''
+    while True:
+        data = stream.read(chunk_size * point_size - len(leftover))
+        if not data:
+            break
+        data = leftover + data
+        whole = len(data) - len(data) % point_size ## a read can stop partway through a point
+        leftover = data[whole:]
+        if whole:
+            yield np.frombuffer(data[:whole], dtype='<f8').reshape(-1, 3)
+
+def _quantize(points, bits):
+    """
+    Scales points onto an integer grid of 2^bits cells along each axis of their bounding box
+
+    Args:
+        points (np.ndarray): The (N,3) points
+        bits (int): The number of bits per axis, at most 21 so three of them fit in 63 bits
+
+    Returns:
+        np.ndarray: the (N,3) uint64 grid coordinates
+    """
+    low = points.min(axis=0)
+    span = np.maximum(points.max(axis=0) - low, np.finfo(np.float64).tiny)
+    cells = (1 << bits) - 1
+    return np.minimum((points - low) / span * cells, cells).astype(np.uint64)
+
+def _interleave(x, y, z):
+    """
+    Interleaves the bits of three arrays of 21 bit integers, x gets the highest bit of each group of three
+
+    Returns:
+        np.ndarray: the uint64 codes
+    """
+    def spread(v):
+        v = v & np.uint64(0x1fffff)
+        v = (v | v << np.uint64(32)) & np.uint64(0x1f00000000ffff)
+        v = (v | v << np.uint64(16)) & np.uint64(0x1f0000ff0000ff)
+        v = (v | v << np.uint64(8)) & np.uint64(0x100f00f00f00f00f)
+        v = (v | v << np.uint64(4)) & np.uint64(0x10c30c30c30c30c3)
+        v = (v | v << np.uint64(2)) & np.uint64(0x1249249249249249)
+        return v
+    return spread(x) << np.uint64(2) | spread(y) << np.uint64(1) | spread(z)
+
+def morton_codes(points, bits=21):
+    """
+    Position of each point along a Morton (Z order) curve through its bounding box
+
+    Args:
+        points (np.ndarray): The (N,3) points
+        bits (int, optional): The number of bits per axis. Defaults to 21.
+
+    Returns:
+        np.ndarray: the (N,) uint64 codes, sorting by them puts nearby points next to each other
+    """
+    grid = _quantize(np.asarray(points, dtype=np.float64).reshape(-1, 3), bits)
+    return _interleave(grid[:, 0], grid[:, 1], grid[:, 2])
+
+def hilbert_codes(points, bits=21):
+    """
+    Position of each point along a Hilbert curve through its bounding box (Skilling's transform, done for every point at once),
+    unlike the Morton curve, consecutive cells along it always share a face
+
+    Args:
+        points (np.ndarray): The (N,3) points
+        bits (int, optional): The number of bits per axis. Defaults to 21.
+
+    Returns:
+        np.ndarray: the (N,) uint64 codes, sorting by them puts nearby points next to each other
+    """
+    x = list(_quantize(np.asarray(points, dtype=np.float64).reshape(-1, 3), bits).T.copy())
+    one = np.uint64(1)
+    for bit in range(bits - 1, 0, -1): ## undo the excess work of the gray code
+        p = np.uint64((1 << bit) - 1)
+        for i in range(3):
+            high = (x[i] >> np.uint64(bit)) & one ## 1 where the bit is set, masks below pick one branch without np.where
+            t = ((x[0] ^ x[i]) & p) * (one - high)
+            x[0] ^= high * p + t
+            if i:
+                x[i] ^= t
+    x[1] ^= x[0] ## gray encode
+    x[2] ^= x[1]
+    t = np.zeros_like(x[0])
+    for bit in range(bits - 1, 0, -1):
+        t ^= ((x[2] >> np.uint64(bit)) & one) * np.uint64((1 << bit) - 1)
+    return _interleave(x[0] ^ t, x[1] ^ t, x[2] ^ t)
+
+def brio_order(points, rng=None, curve='hilbert'):
+    """
+    Biased randomized insertion order: every point goes to the last round with probability 1/2, the rest to the rounds
+    before it the same way, and the rounds are inserted smallest first. Inside a round the points follow a space filling
+    curve, so consecutive insertions are close to each other and touch nearby faces, while the random rounds keep the
+    expected running time of a random order
+
+    Args:
+        points (np.ndarray): The (N,3) points
+        rng (np.random.Generator, optional): The random generator. Defaults to a new unseeded one.
+        curve (str, optional): 'hilbert' or 'morton'. Defaults to 'hilbert'.
+
+    Returns:
+        np.ndarray: the (N,) order to insert the points in
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    codes = (hilbert_codes if curve == 'hilbert' else morton_codes)(points)
+    rounds = np.minimum(rng.geometric(0.5, size=len(codes)), 64) ## 1 for half of the points, 2 for a quarter, ...
+    return np.lexsort((codes, -rounds))
+
 def generate_random_points(n):
     ## helper to test the algorithm
     points = (np.random.rand(n, 3) * 100)
     return [(points[i][0], points[i][1], points[i][2]) for i in range(n)]
 
-def is_convex(dcel):
+def is_convex(dcel, tolerance=1e-9):
     """
-    Helper to test a DCEL for convexity, to ensure correctness of the algorithm by looking at every face and
-    ensuring all points are on the other side of its supporting plane
+    Helper to test a DCEL for convexity, to ensure correctness of the algorithm by checking that
+    no vertex of the DCEL is outside of the supporting plane of any face, see points_outside
 
     Args:
         dcel (DCEL): the DCEL of the convex hull
+        tolerance (float, optional): How far outside a plane a point may be, relative to the size of the hull. Defaults to 1e-9.
 
     Returns:
         boolean: a flag representing if a DCEL is convex
     """
-    for face in dcel.faces:
-        face_vertices = dcel.get_face_vertices(face)
-        if len(face_vertices) < 3:
-            return False  
-        p1, p2, p3 = face_vertices[:3]
-        for vertex in dcel.vertices:
-            if vertex in face_vertices:
-                continue  
-            if determine_visibility(p1, p2, p3, vertex): ## if a interior point is visible, the face is not convex
-                return False
-    return True 
-
-##old code to test normals
-def normal_test():
-    # Define the vertices of a polygon (half-plane)
-    # These are the vertices in 2D
-    x = np.array([1, 4, 4, 1])
-    y = np.array([1, 1, 4, 4])
-
-    # assign z value for 3D display
-    z = np.array([1,2,2,1])
-
-    # Create the 3D plot
-    fig = plt.figure()
-    ax = fig.add_subplot(111, projection='3d')
-    #plot the point
-
-
-    #create vectors 
-    q = Vector(2, 8, -4)  #  absolute position of the point
-    v1 = Vector(x[1]-x[0], y[1]-y[0], z[1]-z[0]) # vector from point 1 to point 2
-    v2 = Vector(x[2]-x[0], y[2]-y[0], z[2]-z[0]) # vector from point 1 to point 3
-    ax.scatter(q.x, q.y, q.z, color='b')
-    print(q.x, q.y, q.z)
-
-    # Create the faces of the polygon (which could be a quad or triangle, etc.)
-    verts = [[(x[i], y[i], z[i]) for i in range(len(x))]]
-    #determine if the point is visible
-    visible = determine_visibility(Vector(x[0], y[0], z[0]), Vector(x[1], y[1], z[1]), Vector(x[2], y[2], z[2]), Vector(2-x[0],8-y[0],-4-z[0]))
-    print(visible)
-    #display points that form the vectors on the graph and label them
-    ax.text(x[0], y[0], z[0], 'p1', color='y')
-    ax.text(x[1], y[1], z[1], 'p2', color='r')
-    ax.text(x[2], y[2], z[2], 'p3', color='g')
-    ax.scatter(x[0], y[0], z[0], color='y')
-    ax.scatter(x[1], y[1], z[1], color='r')
-    ax.scatter(x[2], y[2], z[2], color='g')
-    ax.scatter(q.x, q.y, q.z, color='b')
-
-    #draw the vectors used 
-    ax.quiver(x[0], y[0], z[0], v1.x, v1.y, v1.z, color='r')
-    ax.quiver(x[0], y[0], z[0], v2.x, v2.y, v2.z, color='r')
-    ax.quiver(x[0], y[0], z[0], q.x-x[0], q.y-y[0], q.z-z[0], color='b')
-
-    #draw the normal vector
-    normal_vector =  Vector.cross_product(v1, v2)
-    ax.quiver(x[0], y[0], z[0], normal_vector.x, normal_vector.y, normal_vector.z, color='g')
-
-    # Plot the polygon as a 3D object
-    poly3d = Poly3DCollection(verts, alpha=0.25, linewidths=1, edgecolors='r')
-    ax.add_collection3d(poly3d)
-
-    # Set the labels and limits
-    ax.set_xlabel('X')
-    ax.set_ylabel('Y')
-    ax.set_zlabel('Z')
-
-    # Set the limits for the axes
-    ax.set_xlim([0, 5])
-    ax.set_ylim([0, 5])
-    ax.set_zlim([0, 5])
-
-    plt.show()
+    faces = list(dcel.faces)
+    points = np.array([vertex.coordinates for vertex in dcel.vertices], dtype=np.float64).reshape(-1, 3)
+    return len(faces) > 0 and not len(points_outside(*dcel.get_face_planes(faces), points, tolerance))
+
+def points_outside(normals, offsets, points, tolerance=1e-9, block=None):
+    """
+    Finds the points that are outside of at least one plane, testing blocks of points against every plane
+    as one matrix product so memory stays bounded for any number of points
+
+    Args:
+        normals (np.ndarray): The (F,3) outward normals of the planes, any length
+        offsets (np.ndarray): The (F,) offsets of the planes
+        points (np.ndarray): The (N,3) points, can be memory mapped
+        tolerance (float, optional): How far outside a plane a point may be, relative to the size of the hull
+            (the largest coordinate of the planes' points). Defaults to 1e-9.
+        block (int, optional): The number of points per block, by default sized to keep about 4 million distances at a time.
+
+    Returns:
+        np.ndarray: the indices of the points outside, in order
+    """
+    points = np.asarray(points).reshape(-1, 3)
+    lengths = np.linalg.norm(normals, axis=1)
+    lengths[lengths == 0] = 1 ## a zero area face can't see anything
+    normals = normals / lengths[:, None]
+    offsets = offsets / lengths
+    slack = tolerance * max(np.abs(offsets).max(initial=0), 1.0)
+    if block is None:
+        block = max(1, (1 << 22) // max(len(normals), 1))
+
+    outside = []
+    for start in range(0, len(points), block):
+        distances = np.asarray(points[start:start + block], dtype=np.float64) @ normals.T
+        distances -= offsets
+        outside.append(np.flatnonzero((distances > slack).any(axis=1)) + start)
+    return np.concatenate(outside) if outside else np.empty(0, dtype=np.intp)
+
+def triangle_distances(points, corners, block=None):
+    """
+    Finds the distance from every point to the nearest of some triangles, testing blocks of points against every
+    triangle at once: the distance to the plane when the point is over the triangle, else to the nearest edge
+
+    Args:
+        points (np.ndarray): The (N,3) points
+        corners (np.ndarray): The (F,3,3) corners of the triangles
+        block (int, optional): The number of points per block, by default sized to keep about 250 thousand pairs at a time.
+
+    Returns:
+        np.ndarray: the (N,) distances
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    sides = np.roll(corners, -1, axis=1) - corners ## (F,3,3) edge i runs from corner i to corner i + 1
+    normals = np.cross(sides[:, 0], -sides[:, 2])
+    areas = np.linalg.norm(normals, axis=1)
+    lengths = np.maximum(np.einsum('fij,fij->fi', sides, sides), np.finfo(np.float64).tiny)
+    if block is None:
+        block = max(1, (1 << 18) // max(len(corners), 1))
+
+    distances = np.empty(len(points))
+    for start in range(0, len(points), block):
+        offsets = points[start:start + block, None, None, :] - corners ## (n,F,3,3) from each corner to the point
+        over = (np.einsum('nfij,fj->nfi', np.cross(sides, offsets), normals) >= 0).all(axis=2) & (areas > 0)
+        along = np.clip(np.einsum('nfij,fij->nfi', offsets, sides) / lengths, 0, 1)
+        edges = np.linalg.norm(offsets - along[..., None] * sides, axis=3).min(axis=2)
+        plane = np.abs(np.einsum('nfj,fj->nf', offsets[:, :, 0], normals)) / np.where(areas > 0, areas, 1)
+        distances[start:start + block] = np.where(over, plane, edges).min(axis=1)
+    return distances
+
+def folded_edge_planes(dcel, tolerance=1e-9):
+    """
+    Finds the planes along the folded edges of a hull, the edges where the two faces face opposite ways, as on the rim of
+    a flat hull. The face planes don't bound a flat hull within its plane, these planes through the rim, at a right angle
+    to the faces and facing out, do
+
+    Args:
+        dcel (DCEL): The DCEL of the hull, a DCEL or an ArrayDCEL
+        tolerance (float, optional): How close to parallel the two normals must be, as the sine of the angle between them.
+            Defaults to 1e-9.
+
+    Returns:
+        tuple: the (E,3) outward normals and the (E,) offsets of the planes, empty for a hull with volume
+    """
+    edges = [edge for face in dcel.faces for edge in dcel.get_face_edges(face) if edge.twin.face is not None]
+    if not edges:
+        return np.empty((0, 3)), np.empty(0)
+    normals, _ = dcel.get_face_planes([edge.face for edge in edges])
+    twin_normals, _ = dcel.get_face_planes([edge.twin.face for edge in edges])
+    normals = normals / np.maximum(np.abs(normals).max(axis=1, keepdims=True), np.finfo(np.float64).tiny) ## no underflow below
+    twin_normals = twin_normals / np.maximum(np.abs(twin_normals).max(axis=1, keepdims=True), np.finfo(np.float64).tiny)
+    lengths = np.linalg.norm(normals, axis=1) * np.linalg.norm(twin_normals, axis=1)
+    folded = (np.einsum('ij,ij->i', normals, twin_normals) < 0) & \
+             (np.linalg.norm(np.cross(normals, twin_normals), axis=1) <= tolerance * lengths)
+    starts = np.array([edge.start.coordinates for edge, fold in zip(edges, folded.tolist()) if fold], dtype=np.float64).reshape(-1, 3)
+    ends = np.array([edge.end.coordinates for edge, fold in zip(edges, folded.tolist()) if fold], dtype=np.float64).reshape(-1, 3)
+    sides = np.cross(ends - starts, normals[folded]) ## in the plane of the face, away from it, as the face is counter clockwise
+    return sides, np.einsum('ij,ij->i', sides, starts)
+
+def validate_hull(dcel, points=None, tolerance=1e-9, sample=None, seed=None, block=None):
+    """
+    Checks a hull: the structure of the DCEL (see DCEL.validate) and that no point is outside of any face,
+    or for a flat hull outside of its rim (see folded_edge_planes)
+
+    Args:
+        dcel (DCEL): The DCEL of the hull, a DCEL or an ArrayDCEL
+        points (np.ndarray, optional): The (N,3) points the hull should contain, can be memory mapped.
+            Defaults to the vertices of the DCEL.
+        tolerance (float, optional): How far outside a face a point may be, relative to the size of the hull. Defaults to 1e-9.
+        sample (int, optional): Only test this many points, picked at random, for a quick check of a large input.
+            Defaults to None, every point.
+        seed (int, optional): The seed of the sample. Defaults to None.
+        block (int, optional): The number of points tested at a time, see points_outside.
+
+    Returns:
+        list[str]: a description of every problem found, empty when the hull is valid
+    """
+    problems = dcel.validate()
+    faces = list(dcel.faces)
+    if not faces:
+        return problems + ['the hull has no faces']
+    normals, offsets = dcel.get_face_planes(faces)
+    degenerate = 0
+    for i in np.flatnonzero(~normals.any(axis=1)).tolist(): ## the normal of a tiny face can underflow, check its corners
+        corners = np.array([vertex.coordinates for vertex in dcel.get_face_vertices(faces[i])[:3]], dtype=np.float64)
+        sides = corners[1:] - corners[0]
+        sides /= max(np.abs(sides).max(), np.finfo(np.float64).tiny)
+        degenerate += not np.cross(sides[0], sides[1]).any()
+    if degenerate:
+        problems.append(f'{degenerate} faces have zero area')
+
+    folded_normals, folded_offsets = folded_edge_planes(dcel)
+    normals = np.concatenate((normals, folded_normals))
+    offsets = np.concatenate((offsets, folded_offsets))
+
+    if points is None:
+        points = np.array([vertex.coordinates for vertex in dcel.vertices], dtype=np.float64).reshape(-1, 3)
+    points = np.asarray(points).reshape(-1, 3)
+    if sample is not None and sample < len(points):
+        picked = np.sort(np.random.default_rng(seed).choice(len(points), sample, replace=False))
+        outside = picked[points_outside(normals, offsets, points[picked], tolerance, block)]
+    else:
+        outside = points_outside(normals, offsets, points, tolerance, block)
+    if len(outside):
+        problems.append(f'{len(outside)} points are outside of the hull, for example {outside[:5].tolist()}')
+    return problems
@@ -0,0 +1,106 @@
+import time
+
+class HullStats:
+    """
+    Counters and phase timings of a hull build, made when the hull is built with stats=True.
+    The hull only touches it when it exists, so a build without it runs the same code as before.
+    """
+    PHASES = ('horizon', 'face', 'conflict')
+
+    def __init__(self, trace=False):
+        """
+        Initializes the counters at zero
+
+        Args:
+            trace (bool, optional): A flag to also keep one record per inserted point in self.trace. Defaults to False.
+        """
+        self.insertions = 0  # points that changed the hull
+        self.interior = 0  # points that were inside the hull when their turn came
+        self.visibility_tests = 0  # point against face plane tests
+        self.reassigned_points = 0  # points put in the conflict list of a new face, once for every face they can see
+        self.faces_created = 0
+        self.faces_removed = 0
+        self.horizon_max = 0  # largest horizon seen, a few huge horizons point at a degenerate input
+        self.horizon_time = 0.0  # seconds in get_horizon
+        self.face_time = 0.0  # seconds making the new faces
+        self.conflict_time = 0.0  # seconds updating the conflict graph
+        self.trace = [] if trace else None
+
+        self._point = None
+        self._clock = 0.0
+        self._laps = {}
+        self._start_counts = None
+
+    def start(self, point):
+        """
+        Starts the clock on an insertion
+
+        Args:
+            point (int): The input index of the point being inserted
+        """
+        self._point = point
+        self._laps = {}
+        self._start_counts = (self.visibility_tests, self.reassigned_points, self.faces_removed)
+        self._clock = time.perf_counter()
+
+    def lap(self, phase):
+        """
+        Adds the time since the last lap to a phase
+
+        Args:
+            phase (str): One of PHASES
+        """
+        now = time.perf_counter()
+        elapsed = now - self._clock
+        setattr(self, phase + '_time', getattr(self, phase + '_time') + elapsed)
+        self._laps[phase] = elapsed
+        self._clock = now
+
+    def finish(self, horizon):
+        """
+        Ends an insertion, the time since the last lap goes to the conflict update
+
+        Args:
+            horizon (int): The number of horizon edges, which is also the number of faces made
+        """
+        self.lap('conflict')
+        self.insertions += 1
+        self.faces_created += horizon
+        self.horizon_max = max(self.horizon_max, horizon)
+        if self.trace is not None:
+            tests, reassigned, removed = self._start_counts
+            self.trace.append({'point': self._point, 'horizon': horizon,
+                               'faces_removed': self.faces_removed - removed, 'faces_created': horizon,
+                               'visibility_tests': self.visibility_tests - tests,
+                               'reassigned_points': self.reassigned_points - reassigned,
+                               **{phase + '_time': self._laps.get(phase, 0.0) for phase in self.PHASES}})
+
+    @property
+    def horizon_mean(self):
+        """
+        The average horizon size over the insertions
+        """
+        return self.faces_created / self.insertions if self.insertions else 0.0
+
+    def as_dict(self):
+        """
+        The counters and timings as a dict, ready for json
+
+        Returns:
+            dict: every counter, the mean horizon size and the trace if it is kept
+        """
+        stats = {name: getattr(self, name) for name in ('insertions', 'interior', 'visibility_tests', 'reassigned_points',
+                                                         'faces_created', 'faces_removed', 'horizon_max', 'horizon_mean',
+                                                         'horizon_time', 'face_time', 'conflict_time')}
+        if self.trace is not None:
+            stats['trace'] = self.trace
+        return stats
+
+    def __repr__(self): ## for degbugging
+        return (f'HullStats: {self.insertions} insertions, {self.interior} interior, {self.visibility_tests} visibility tests, '
+                f'{self.reassigned_points} reassigned, {self.faces_created} faces created, {self.faces_removed} removed, '
+                f'horizon mean {self.horizon_mean:.2f} max {self.horizon_max}, time horizon {self.horizon_time:.4f} sec '
+                f'face {self.face_time:.4f} sec conflict {self.conflict_time:.4f} sec')
+
+    def __str__(self):
+        return self.__repr__()
@@ -0,0 +1,130 @@
+import os
+
+import numpy as np
+
+## PLY property types and their NumPy equivalents
+PLY_TYPES = {
+    'char': 'i1', 'int8': 'i1', 'uchar': 'u1', 'uint8': 'u1',
+    'short': 'i2', 'int16': 'i2', 'ushort': 'u2', 'uint16': 'u2',
+    'int': 'i4', 'int32': 'i4', 'uint': 'u4', 'uint32': 'u4',
+    'float': 'f4', 'float32': 'f4', 'double': 'f8', 'float64': 'f8',
+}
+
+def load_points(path, dtype='<f8'):
+    """
+    Memory maps a point file, picking the loader from the extension: .npy, .ply, anything else is read as raw triples
+
+    Args:
+        path (str): The file to map
+        dtype (str, optional): The type of the raw triples, '<f8' or '<f4'. Defaults to '<f8'.
+
+    Returns:
+        np.ndarray: an (N,3) array backed by the file, nothing is read until it is used
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.npy':
+        return load_npy(path)
+    if extension == '.ply':
+        return load_ply(path)
+    return load_raw(path, dtype)
+
+def load_npy(path):
+    """
+    Memory maps an (N,3) .npy file
+
+    Args:
+        path (str): The file to map
+
+    Raises:
+        ValueError: the array isn't (N,3)
+
+    Returns:
+        np.ndarray: the (N,3) array backed by the file
+    """
+    points = np.load(path, mmap_mode='r')
+    if points.ndim != 2 or points.shape[1] != 3:
+        raise ValueError(f"Expected an (N,3) array in {path}, got {points.shape}.")
+    return points
+
+def load_raw(path, dtype='<f8'):
+    """
+    Memory maps a file of packed (x, y, z) triples with no header
+
+    Args:
+        path (str): The file to map
+        dtype (str, optional): The type of each coordinate, '<f8' for little endian float64 or '<f4' for float32. Defaults to '<f8'.
+
+    Raises:
+        ValueError: the file size isn't a whole number of triples
+
+    Returns:
+        np.ndarray: the (N,3) array backed by the file
+    """
+    point_size = 3 * np.dtype(dtype).itemsize
+    size = os.path.getsize(path)
+    if size % point_size:
+        raise ValueError(f"{path} is {size} bytes, not a whole number of {point_size} byte points.")
+    if not size:
+        return np.empty((0, 3), dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r').reshape(-1, 3)
+
+def load_ply(path):
+    """
+    Memory maps the x, y and z properties of the vertex element of a binary PLY file. When x, y and z are
+    consecutive properties of the same type, as they almost always are, the result is a strided view of the file
+    with no copy, otherwise the three columns are copied out
+
+    Args:
+        path (str): The file to map
+
+    Raises:
+        ValueError: the file is ascii, has no vertex element, or the vertex element can't be located
+
+    Returns:
+        np.ndarray: the (N,3) array of vertex coordinates
+    """
+    with open(path, 'rb') as f:
+        if f.readline().strip() != b'ply':
+            raise ValueError(f"{path} is not a PLY file.")
+        byte_order = None
+        elements = [] ## [name, count, [(property, type)]]
+        while True:
+            line = f.readline()
+            if not line:
+                raise ValueError(f"{path} has no end_header.")
+            words = line.decode('ascii').split()
+            if not words or words[0] in ('comment', 'obj_info'):
+                continue
+            if words[0] == 'end_header':
+                break
+            if words[0] == 'format':
+                if words[1] not in ('binary_little_endian', 'binary_big_endian'):
+                    raise ValueError(f"{path} is {words[1]}, only binary PLY files can be mapped.")
+                byte_order = '<' if words[1] == 'binary_little_endian' else '>'
+            elif words[0] == 'element':
+                elements.append([words[1], int(words[2]), []])
+            elif words[0] == 'property':
+                if words[1] == 'list':
+                    elements[-1][2].append((words[4], None)) ## variable size, can't be mapped
+                else:
+                    elements[-1][2].append((words[2], byte_order + PLY_TYPES[words[1]]))
+        offset = f.tell()
+
+    for name, count, properties in elements:
+        if any(kind is None for _, kind in properties):
+            if name == 'vertex':
+                raise ValueError(f"{path} has list properties in its vertex element.")
+            raise ValueError(f"{path} has a variable size {name} element before the vertices.")
+        element_type = np.dtype(properties)
+        if name == 'vertex':
+            break
+        offset += count * element_type.itemsize
+    else:
+        raise ValueError(f"{path} has no vertex element.")
+
+    vertices = np.memmap(path, dtype=element_type, mode='r', offset=offset, shape=(count,))
+    x, y, z = (element_type.fields[axis] for axis in 'xyz')
+    if x[0] == y[0] == z[0] and y[1] - x[1] == z[1] - y[1] == x[0].itemsize:
+        return np.ndarray((count, 3), dtype=x[0], buffer=vertices, offset=x[1],
+                          strides=(element_type.itemsize, x[0].itemsize))
+    return np.stack([vertices['x'], vertices['y'], vertices['z']], axis=1)
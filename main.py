@@ -1,43 +1,45 @@
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
 import math
+import subprocess
+import sys
 import time
 from RandomIncHull import RandomIncrementalHull3D
+import engines
 import helpers
-import matplotlib.pyplot as plt
+import pipeline
+import service
 
-def time_algorithm(n_values, i, decrement_i = True):
+IMPORT_BUDGET = 0.25 ## seconds for a cold import of the engine, about 0.09 here against 0.5 with matplotlib
+
+def import_time(module = 'RandomIncHull', runs = 5, budget = IMPORT_BUDGET):
     """
-    Times the algorithm for different values of n, ensuring that the total time is > 1 second for accurate timing
+    Measures the cold import time of a module in fresh interpreters, so headless batch jobs can check that
+    building a hull doesn't pull in matplotlib
 
     Args:
-        n_values (list[int]): list of n values to test
-        i (int): number of iterations to start with
+        module (str, optional): The module to import. Defaults to 'RandomIncHull'.
+        runs (int, optional): The number of fresh interpreters to start, the fastest one is kept. Defaults to 5.
+        budget (float, optional): The time allowed in seconds. Defaults to IMPORT_BUDGET.
+
+    Returns:
+        tuple: the best import time in seconds and whether it is within the budget without any run loading matplotlib
     """
-    total_time = 0
-    iterations = i
-    results = []
-    for n in n_values:
-        for i in range(iterations):
-            points = helpers.generate_random_points(n)
-            start = time.time()
-            RandomIncrementalHull3D(points)
-            elapsed = time.time() - start
-            total_time += elapsed
-        avg_time = total_time / iterations
-        results.append(avg_time)
-        if decrement_i and total_time > 2 and iterations >= 10:
-            iterations = iterations//2
-        print(f"n = {n:5d} | Average Time = {avg_time:.4f} sec over {iterations:2d} iterations | Total Time = {total_time:.4f} sec")
-        total_time = 0
-  
-    # Plot the runtime, seems to be O(n)
-    plt.figure(figsize=(10, 6))
-    plt.plot(n_values, results, marker='o', linestyle='-', color='b')
-    plt.xlabel('Number of Points (n)')
-    plt.ylabel('Average Time (seconds) Over 100 Iterations')
-    plt.title('Runtime of Randomized Incremental Convex Hull in 3D')
-    plt.grid(True)
-    plt.savefig('runtime.png')
-    plt.show()
+    script = (f"import sys, time; start = time.perf_counter(); import {module}; "
+              f"print(time.perf_counter() - start, 'matplotlib' in sys.modules)")
+    best = math.inf
+    plotting = False ## whether any run loaded matplotlib, not just the last one
+    for _ in range(runs):
+        elapsed, loaded = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True,
+                                         check=True).stdout.split()
+        best = min(best, float(elapsed))
+        plotting = plotting or loaded == 'True'
+    within = best <= budget and not plotting
+    print(f"import {module}: {best:.4f} sec (budget {budget:.2f} sec){', loads matplotlib' if plotting else ''}")
+    return best, within
 
 def visualize_hull(n: int, dis_inc = False):
     """
@@ -59,19 +61,133 @@ def visualize_hull(n: int, dis_inc = False):
 
 
 
-def main():
+def run_hulls(args):
     """
-    main function to demonstrate runtime and the algo for a smaller n
-    Set display_incremental to True to see the incremental hull being built, 
-    close the window over and over to go step by step
+    The 'hull' command, builds the hull of every input with pipeline.run_pipeline and prints a line per file as it
+    finishes, then the totals. With --json every line is a JSON object and the totals go to stderr
+
+    Args:
+        args (argparse.Namespace): The parsed command line
+
+    Returns:
+        int: 1 if any file failed, else 0
     """
-    n_values = [16000, 24000, 32000, 48000, 64000, 96000, 128000, 192000, 256000]
-    display_incremental = True ## change this to True to see the incremental hull being built
-    n = 100
-    
-    # time_algorithm(n_values, 10, False)
-    visualize_hull(n, display_incremental) ## visualize the hull for n points, either complete or step by step
-    
+    if args.files_from == pipeline.STDIN and pipeline.STDIN in args.inputs:
+        raise SystemExit("stdin can hold the points or the list of files, not both.")
+    paths = iter(args.inputs)
+    stdin_points = None
+    if pipeline.STDIN in args.inputs:
+        stdin_points = pipeline.read_stdin_points(sys.stdin.buffer, args.stdin_binary)
+
+    files = failed = points = cached = 0
+    start = time.perf_counter()
+    with contextlib.ExitStack() as stack: ## the listing is read lazily, it stays open until the last file is done
+        if args.files_from is not None:
+            listing = sys.stdin if args.files_from == pipeline.STDIN else stack.enter_context(open(args.files_from))
+            paths = itertools.chain(paths, pipeline.read_paths(listing))
+        for result in pipeline.run_pipeline(paths, args.out, args.format, args.workers, stdin_points, engine=args.engine,
+                                            dcel=args.dcel, prefilter=args.prefilter, dtype=args.dtype,
+                                            cache_dir=args.cache):
+            files += 1
+            failed += 'error' in result
+            points += result.get('points', 0)
+            cached += result.get('cached', False)
+            print(json.dumps(result) if args.json else pipeline.format_result(result), flush=True)
+    elapsed = time.perf_counter() - start
+
+    summary = (f"{files} files, {failed} failed, {cached} cached, {points} points in {elapsed:.4f} sec"
+               f" | {points / elapsed / 1e6 if elapsed else 0.0:.3f} M points/sec")
+    print(summary, file=sys.stderr if args.json else sys.stdout)
+    return 1 if failed else 0
+
+def run_service(args):
+    """
+    The 'serve' command, runs a service.HullService until interrupted and prints its stats
+
+    Args:
+        args (argparse.Namespace): The parsed command line
+
+    Returns:
+        int: 0
+    """
+    hull_service = service.HullService(args.socket, args.workers, args.max_pending, args.batch_size, args.batch_points,
+                                       args.batch_wait, args.timeout, engine=args.engine, dcel=args.dcel,
+                                       prefilter=args.prefilter)
+    print(f"serving hulls on {args.socket} with {hull_service.workers} workers, ctrl-c to stop", file=sys.stderr)
+    try:
+        asyncio.run(hull_service.serve())
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(hull_service.stats()))
+    return 0
+
+def main(argv=None):
+    """
+    Command line entry point
+
+        python main.py hull scans/*.ply --out meshes --workers 8   build and write the hull of every file
+        python main.py serve --socket /tmp/hull.sock --workers 8      serve hulls to local clients over a Unix socket
+        python main.py load-test --socket /tmp/hull.sock              measure the throughput and latency of the service
+        python main.py visualize --n 100 --incremental                show the hull of random points, step by step
+        python main.py import-time                                    check that building a hull doesn't load matplotlib
+
+    Benchmarks have their own command line in benchmark.py
+    """
+    parser = argparse.ArgumentParser(description='Build 3D convex hulls.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    hull = commands.add_parser('hull', help='build the hull of point files in a worker pool and write indexed meshes')
+    hull.add_argument('inputs', nargs='*', help="point files (.npy, .ply or raw triples), '-' reads points from stdin")
+    hull.add_argument('--files-from', help="read more input paths from this file, one per line, '-' for stdin")
+    hull.add_argument('--out', help='directory to write the meshes to, nothing is written without it')
+    hull.add_argument('--format', choices=['npz', 'npy', 'stl', 'obj'], default='npz')
+    hull.add_argument('--workers', type=int, default=None, help='worker processes, defaults to the number of CPUs')
+    hull.add_argument('--engine', choices=list(engines.ENGINES), default='random')
+    hull.add_argument('--dcel', choices=list(engines.DCELS), default='object')
+    hull.add_argument('--prefilter', action='store_true')
+    hull.add_argument('--dtype', choices=['<f8', '<f4'], default='<f8', help='type of raw point files')
+    hull.add_argument('--stdin-binary', action='store_true', help='points on stdin are float64 triples, not text')
+    hull.add_argument('--cache', help='directory of a hull cache, point sets seen before are read back instead of built')
+    hull.add_argument('--json', action='store_true', help='print one JSON object per file')
+    serve = commands.add_parser('serve', help='build hulls for local clients in a worker pool, over a Unix socket')
+    serve.add_argument('--socket', default='/tmp/hull.sock')
+    serve.add_argument('--workers', type=int, default=None, help='worker processes, defaults to the number of CPUs')
+    serve.add_argument('--max-pending', type=int, default=1024, help='queued requests before clients are pushed back')
+    serve.add_argument('--batch-size', type=int, default=64, help='most requests sent to a worker at once')
+    serve.add_argument('--batch-points', type=int, default=50000, help='stop adding requests to a batch past this many points')
+    serve.add_argument('--batch-wait', type=float, default=0.002, help='seconds to wait for requests to batch together')
+    serve.add_argument('--timeout', type=float, default=30.0, help='seconds a request is given by default')
+    serve.add_argument('--engine', choices=list(engines.ENGINES), default='random')
+    serve.add_argument('--dcel', choices=list(engines.DCELS), default='object')
+    serve.add_argument('--prefilter', action='store_true')
+    load = commands.add_parser('load-test', help='send requests to a running service and report throughput and latency')
+    load.add_argument('--socket', default='/tmp/hull.sock')
+    load.add_argument('--requests', type=int, default=1000)
+    load.add_argument('--concurrency', type=int, default=32, help='requests in flight at once')
+    load.add_argument('--connections', type=int, default=4)
+    load.add_argument('--sizes', type=int, nargs=2, default=[100, 10000], metavar=('MIN', 'MAX'), help='points per request')
+    load.add_argument('--timeout', type=float, default=0.0, help='seconds per request, 0 for the service default')
+    show = commands.add_parser('visualize', help='show the hull of random points')
+    show.add_argument('--n', type=int, default=100)
+    show.add_argument('--incremental', action='store_true', help='step through the build with the space key')
+    timing = commands.add_parser('import-time', help='time a cold import of the engine')
+    timing.add_argument('--module', default='RandomIncHull')
+    timing.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if args.command == 'hull':
+        if not args.inputs and args.files_from is None:
+            parser.error('hull needs input files, - for stdin, or --files-from')
+        return run_hulls(args)
+    if args.command == 'serve':
+        return run_service(args)
+    if args.command == 'load-test':
+        print(json.dumps(asyncio.run(service.load_test(args.socket, args.requests, args.concurrency, args.connections,
+                                                       tuple(args.sizes), args.timeout)), indent=2))
+        return 0
+    if args.command == 'visualize':
+        visualize_hull(args.n, args.incremental) ## visualize the hull for n points, either complete or step by step
+        return 0
+    return 0 if import_time(args.module, args.runs)[1] else 1
     
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""
+Batch hull pipeline: builds the hull of many point files in a pool of worker processes and writes each one as an
+indexed mesh. Results are yielded as the files finish, nothing but the files in flight is held in memory, so a list
+of thousands of files can be streamed through it. main.py holds the command line around it:
+
+    python main.py hull scans/*.ply --out meshes --workers 8
+    find scans -name '*.npy' | python main.py hull --files-from - --out meshes --json
+    cat points.txt | python main.py hull - --out meshes
+"""
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+import os
+import time
+
+import numpy as np
+
+from engines import DCELS, ENGINES
+import exporters
+import helpers
+from HullCache import HullCache
+import loaders
+
+STDIN = '-' ## the input name of points read from stdin
+CACHES = {} ## (directory, engine, dcel, prefilter): the HullCache of this process
+
+def hull_file(path, out_dir=None, fmt='npz', points=None, engine='random', dcel='object', prefilter=False, dtype='<f8',
+              cache_dir=None):
+    """
+    Builds the hull of one point file and writes its indexed mesh, the worker of run_pipeline
+
+    Args:
+        path (str): The point file, see loaders.load_points, or STDIN when the points are given
+        out_dir (str, optional): The directory to write <name>.<fmt> to, nothing is written when None. Defaults to None.
+        fmt (str, optional): The mesh format, 'npz', 'npy', 'stl' or 'obj', see exporters.write_mesh. Defaults to 'npz'.
+        points (np.ndarray, optional): The (N,3) points, for STDIN. Defaults to None.
+        engine (str, optional): The engine in engines.ENGINES. Defaults to 'random'.
+        dcel (str, optional): The DCEL in engines.DCELS. Defaults to 'object'.
+        prefilter (bool, optional): Passed to the engine. Defaults to False.
+        dtype (str, optional): The type of raw point files. Defaults to '<f8'.
+        cache_dir (str, optional): The on disk store of a HullCache shared by every worker, point sets seen before
+            aren't built again. Defaults to None.
+
+    Returns:
+        dict: the input, the output, the number of points, hull vertices and faces, whether the mesh came from the cache,
+        the seconds spent loading, building and writing and the points per second, or the input and an 'error' when
+        the file failed
+    """
+    try:
+        start = time.perf_counter()
+        if points is None:
+            points = loaders.load_points(path, dtype)
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3) ## reads a mapped file
+        loaded = time.perf_counter()
+        cached = False
+        if cache_dir is None:
+            vertices, triangles, indices = ENGINES[engine](points, dcel=DCELS[dcel], prefilter=prefilter).export_mesh()
+        else:
+            cache = CACHES.get((cache_dir, engine, dcel, prefilter))
+            if cache is None:
+                cache = CACHES[cache_dir, engine, dcel, prefilter] = HullCache(directory=cache_dir, engine=ENGINES[engine],
+                                                                               dcel=DCELS[dcel], prefilter=prefilter)
+            misses = cache.misses
+            vertices, triangles, indices = cache.mesh(points)
+            cached = cache.misses == misses
+        built = time.perf_counter()
+        output = None
+        if out_dir is not None:
+            name = 'stdin' if path == STDIN else os.path.splitext(os.path.basename(path))[0]
+            output = os.path.join(out_dir, f'{name}.{fmt}')
+            exporters.write_mesh(output, vertices, triangles, indices)
+        written = time.perf_counter()
+    except Exception as error: ## one bad file doesn't stop the batch, whatever it raises
+        return {'input': path, 'error': f'{type(error).__name__}: {error}'}
+
+    return {'input': path, 'output': output, 'points': len(points), 'vertices': len(vertices), 'faces': len(triangles),
+            'cached': cached, 'load_time': loaded - start, 'build_time': built - loaded, 'write_time': written - built,
+            'points_per_sec': len(points) / (built - start) if built > start else 0.0}
+
+def run_pipeline(paths, out_dir=None, fmt='npz', workers=None, stdin_points=None, **kwargs):
+    """
+    Builds the hull of every file in a pool of worker processes and yields each result as soon as it is done,
+    in the order they finish. At most two files per worker are in flight, so paths can be a lazy stream
+
+    Args:
+        paths (Iterable[str]): The point files, STDIN stands for stdin_points
+        out_dir (str, optional): The directory to write the meshes to, made if missing, None to write nothing. Defaults to None.
+        fmt (str, optional): The mesh format, see hull_file. Defaults to 'npz'.
+        workers (int, optional): The number of worker processes, 1 builds in this process. Defaults to the number of CPUs.
+        stdin_points (np.ndarray, optional): The points read from stdin, see read_stdin_points. Defaults to None.
+        **kwargs: passed to hull_file (engine, dcel, prefilter, dtype, cache_dir)
+
+    Yields:
+        dict: the result of hull_file for each file
+    """
+    workers = workers or os.cpu_count() or 1
+    if out_dir is not None:
+        os.makedirs(out_dir, exist_ok=True)
+    jobs = ((path, out_dir, fmt, stdin_points if path == STDIN else None) for path in paths)
+    if workers == 1:
+        for job in jobs:
+            yield hull_file(*job, **kwargs)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for job in jobs:
+            pending.add(pool.submit(hull_file, *job, **kwargs))
+            if len(pending) >= 2 * workers: ## keep the pool busy without queueing the whole list
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in as_completed(pending):
+            yield future.result()
+
+def read_paths(stream):
+    """
+    Reads one path per line, skipping blank lines, lazily so a long listing streams into the pool
+
+    Args:
+        stream (file): A text stream, such as sys.stdin or the output of find
+
+    Yields:
+        str: each path
+    """
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield line
+
+def read_stdin_points(stream, binary=False):
+    """
+    Reads all the points on a stream at once
+
+    Args:
+        stream (file): A binary stream, such as sys.stdin.buffer
+        binary (bool, optional): A flag for packed little endian float64 triples (helpers.read_point_chunks) instead
+            of text with three numbers per line. Defaults to False.
+
+    Returns:
+        np.ndarray: the (N,3) points
+    """
+    if binary:
+        chunks = list(helpers.read_point_chunks(stream))
+        return np.concatenate(chunks) if chunks else np.empty((0, 3))
+    return np.loadtxt(stream, dtype=np.float64, ndmin=2).reshape(-1, 3)
+
+def format_result(result):
+    """
+    One line describing a result of hull_file
+
+    Args:
+        result (dict): The result
+
+    Returns:
+        str: the line
+    """
+    if 'error' in result:
+        return f"{result['input']} | FAILED | {result['error']}"
+    return (f"{result['input']} | {result['points']} points | {result['vertices']} vertices | {result['faces']} faces"
+            f"{' | cached' if result.get('cached') else ''}"
+            f" | load {result['load_time']:.4f} sec | build {result['build_time']:.4f} sec"
+            f" | write {result['write_time']:.4f} sec | {result['points_per_sec'] / 1e6:.3f} M points/sec")
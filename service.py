@@ -0,0 +1,487 @@
+"""
+Hull service: an asyncio server on a Unix socket that takes point buffers from many clients, batches the small ones
+together and builds them in a pool of worker processes, so the event loop of a caller never blocks on a build.
+HullClient is its client and load_test a load generator to measure it on one machine, main.py holds the command line:
+
+    python main.py serve --socket /tmp/hull.sock --workers 8
+    python main.py load-test --socket /tmp/hull.sock --requests 2000 --concurrency 64
+"""
+import asyncio
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import itertools
+import json
+import os
+import signal
+import stat
+import time
+
+import numpy as np
+
+from engines import DCELS, ENGINES
+
+## a request is its header followed by the points as float64 triples, a response is its header followed by length bytes,
+## the hull vertices as float64, the triangles as int32 and the input indices as uint32, or utf-8 text for errors and stats
+REQUEST_HEADER = np.dtype([('id', '<u4'), ('kind', '<u1'), ('reserved', '<u1', (3,)), ('timeout', '<f4'), ('points', '<u4')])
+RESPONSE_HEADER = np.dtype([('id', '<u4'), ('status', '<u1'), ('reserved', '<u1', (3,)), ('vertices', '<u4'),
+                            ('triangles', '<u4'), ('length', '<u4')])
+HULL, STATS = 0, 1 ## request kinds
+OK, ERROR, TIMEOUT = 0, 1, 2 ## response statuses
+
+class HullService:
+    """
+    The server. Every request goes into one bounded queue that a batcher drains: requests that arrive within batch_wait
+    of each other are sent to a worker together, up to batch_size requests or batch_points points, so small hulls don't
+    pay a round trip to a process each. At most two batches per worker are in flight, when they are all busy the queue
+    fills up and the connections stop being read until there is room, which pushes back on the clients.
+    A request that isn't answered within its timeout gets a TIMEOUT response and is skipped if it hasn't been sent yet
+    """
+    def __init__(self, path, workers = None, max_pending = 1024, batch_size = 64, batch_points = 50000, batch_wait = 0.002,
+                 timeout = 30.0, max_points = 1 << 24, engine = 'random', dcel = 'object', prefilter = False, window = 100000):
+        """
+        Initializes the service, nothing runs until serve
+
+        Args:
+            path (str): The Unix socket to listen on
+            workers (int, optional): The number of worker processes. Defaults to the number of CPUs.
+            max_pending (int, optional): The most requests queued before the connections stop being read. Defaults to 1024.
+            batch_size (int, optional): The most requests in one batch. Defaults to 64.
+            batch_points (int, optional): No more requests are added to a batch once it has this many points. Defaults to 50000.
+            batch_wait (float, optional): Seconds to wait for more requests to batch with the first one. Defaults to 0.002.
+            timeout (float, optional): Seconds a request is given when it doesn't set its own. Defaults to 30.0.
+            max_points (int, optional): The largest request, the connection of a larger one is closed. Defaults to 2**24.
+            engine (str, optional): The engine in engines.ENGINES. Defaults to 'random'.
+            dcel (str, optional): The DCEL in engines.DCELS. Defaults to 'object'.
+            prefilter (bool, optional): Passed to the engine. Defaults to False.
+            window (int, optional): The number of recent latencies the percentiles are taken over. Defaults to 100000.
+        """
+        self.path = path
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.batch_points = batch_points
+        self.batch_wait = batch_wait
+        self.timeout = timeout
+        self.max_points = max_points
+        self.options = {'engine': engine, 'dcel': dcel, 'prefilter': prefilter}
+        self.queue = None ## (points, future) of every request not sent to a worker yet, made on the loop by serve
+        self.slots = None ## semaphore of the batches in flight
+        self.pool = None ## the worker processes, made by serve and made again when a worker dies
+        self.tasks = set() ## running reply and batch tasks, kept so they aren't garbage collected
+
+        self.latencies = deque(maxlen=window) ## seconds from reading each request to its OK response
+        self.requests = 0
+        self.completed = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.batches = 0
+        self.batched = 0 ## requests sent to workers, over batches is the mean batch size
+        self.restarts = 0 ## pools replaced after a worker died
+
+    async def serve(self, ready = None):
+        """
+        Listens on the socket and serves requests until cancelled
+
+        Args:
+            ready (asyncio.Event, optional): Set once the socket accepts connections. Defaults to None.
+        """
+        if os.path.exists(self.path) and stat.S_ISSOCK(os.stat(self.path).st_mode): ## left behind by a server that died
+            os.unlink(self.path)
+        self.queue = asyncio.Queue(self.max_pending)
+        self.slots = asyncio.Semaphore(2 * self.workers)
+        self.pool = self.start_pool()
+        server = await asyncio.start_unix_server(self.handle, self.path)
+        batcher = asyncio.create_task(self.batch())
+        try:
+            async with server:
+                if ready is not None:
+                    ready.set()
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    async def handle(self, reader, writer):
+        """
+        Reads the requests of one connection, queues them and starts a task to answer each, answers can come back in
+        any order. Waits for room in the queue before reading the next request
+
+        Args:
+            reader (asyncio.StreamReader): The connection
+            writer (asyncio.StreamWriter): The connection
+        """
+        loop = asyncio.get_running_loop()
+        replies = set()
+        try:
+            while True:
+                header = np.frombuffer(await reader.readexactly(REQUEST_HEADER.itemsize), dtype=REQUEST_HEADER)[0]
+                request = int(header['id'])
+                if header['kind'] == STATS:
+                    await self.respond(writer, request, OK, text=json.dumps(self.stats()))
+                    continue
+                if header['points'] > self.max_points: ## too big to read, the client sees the connection close
+                    break
+                start = time.perf_counter()
+                points = np.frombuffer(await reader.readexactly(int(header['points']) * 24), dtype='<f8').reshape(-1, 3)
+                self.requests += 1
+                future = loop.create_future()
+                reply = self.spawn(self.reply(writer, request, future, start, float(header['timeout']) or self.timeout))
+                replies.add(reply)
+                reply.add_done_callback(replies.discard)
+                await self.queue.put((points, future))
+        except (asyncio.IncompleteReadError, ConnectionError): ## the client is done sending or went away
+            pass
+        except asyncio.CancelledError: ## the service is shutting down, nothing will answer the requests in flight
+            for reply in replies:
+                reply.cancel()
+            replies.clear()
+        finally:
+            if replies:
+                await asyncio.wait(replies)
+            writer.close()
+
+    async def reply(self, writer, request, future, start, timeout):
+        """
+        Waits for the hull of one request and writes the response
+
+        Args:
+            writer (asyncio.StreamWriter): The connection
+            request (int): The id of the request
+            future (asyncio.Future): Set to the mesh by run_batch, or to a ValueError
+            start (float): The perf_counter time the request was read
+            timeout (float): Seconds the request is given
+        """
+        try:
+            vertices, triangles, indices = await asyncio.wait_for(future, timeout) ## cancels the future on a timeout
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            await self.respond(writer, request, TIMEOUT, text=f'no hull after {timeout} sec')
+        except ValueError as error:
+            self.errors += 1
+            await self.respond(writer, request, ERROR, text=str(error))
+        else:
+            self.latencies.append(time.perf_counter() - start)
+            self.completed += 1
+            await self.respond(writer, request, OK, vertices, triangles, indices)
+
+    async def respond(self, writer, request, status, vertices = None, triangles = None, indices = None, text = ''):
+        """
+        Writes one response
+
+        Args:
+            writer (asyncio.StreamWriter): The connection
+            request (int): The id of the request
+            status (int): OK, ERROR or TIMEOUT
+            vertices (np.ndarray, optional): The (V,3) hull vertices. Defaults to None.
+            triangles (np.ndarray, optional): The (F,3) vertex rows of each face. Defaults to None.
+            indices (np.ndarray, optional): The (V,) input index of each vertex. Defaults to None.
+            text (str, optional): The body of a response without a mesh. Defaults to ''.
+        """
+        if vertices is None:
+            payload = text.encode()
+            counts = (0, 0)
+        else:
+            payload = b''.join((vertices.astype('<f8').tobytes(), triangles.astype('<i4').tobytes(),
+                                indices.astype('<u4').tobytes()))
+            counts = (len(vertices), len(triangles))
+        header = np.zeros(1, dtype=RESPONSE_HEADER)
+        header[0] = (request, status, 0, *counts, len(payload))
+        if writer.is_closing():
+            return
+        writer.write(header.tobytes() + payload)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    def start_pool(self):
+        """
+        Starts the worker processes, they ignore ctrl-c so it stops the server and not the workers
+
+        Returns:
+            ProcessPoolExecutor: the pool
+        """
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=signal.signal, initargs=(signal.SIGINT, signal.SIG_IGN))
+
+    async def batch(self):
+        """
+        Takes requests off the queue in batches and sends them to the workers, runs until cancelled
+        """
+        while True:
+            batch = [await self.queue.get()]
+            if self.queue.empty() and self.batch_wait:
+                await asyncio.sleep(self.batch_wait) ## give the requests of a burst time to arrive
+            points = len(batch[0][0])
+            while not self.queue.empty() and len(batch) < self.batch_size and points < self.batch_points:
+                batch.append(self.queue.get_nowait())
+                points += len(batch[-1][0])
+            batch = [request for request in batch if not request[1].done()] ## timed out while queued
+            if batch:
+                await self.slots.acquire()
+                self.spawn(self.run_batch(batch))
+
+    async def run_batch(self, batch):
+        """
+        Builds one batch in a worker and hands every request its result. When a worker dies the batches in flight fail
+        and the broken pool is replaced, so the requests after them are served again
+
+        Args:
+            batch (list[tuple]): The (points, future) of each request
+        """
+        self.batches += 1
+        self.batched += len(batch)
+        pool = self.pool
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(pool, build_batch, [points for points, _ in batch],
+                                                                         *self.options.values())
+        except BrokenProcessPool as error:
+            results = [f'{type(error).__name__}: {error}'] * len(batch)
+            if self.pool is pool: ## the first of the batches in flight to fail, the others find it replaced
+                pool.shutdown(wait=False, cancel_futures=True)
+                self.pool = self.start_pool()
+                self.restarts += 1
+        except Exception as error: ## the batch or its results couldn't be pickled
+            results = [f'{type(error).__name__}: {error}'] * len(batch)
+        finally:
+            self.slots.release()
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, str):
+                future.set_exception(ValueError(result))
+            else:
+                future.set_result(result)
+
+    def spawn(self, coroutine):
+        """
+        Runs a coroutine as a task and keeps a reference to it until it is done
+
+        Returns:
+            asyncio.Task: the task
+        """
+        task = asyncio.create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def stats(self):
+        """
+        The counters and latency percentiles, ready for json
+
+        Returns:
+            dict: the requests read, completed, failed and timed out, the requests queued, the batches and their mean size,
+            the pools replaced after a worker died, and the p50, p90, p99 and max latency in seconds of the last window requests
+        """
+        return {'requests': self.requests, 'completed': self.completed, 'errors': self.errors, 'timeouts': self.timeouts,
+                'queued': self.queue.qsize() if self.queue is not None else 0, 'batches': self.batches,
+                'mean_batch': self.batched / self.batches if self.batches else 0.0, 'restarts': self.restarts,
+                **latency_percentiles(self.latencies)}
+
+def build_batch(batch, engine = 'random', dcel = 'object', prefilter = False):
+    """
+    Builds the hull of every point set of a batch, the worker of HullService
+
+    Args:
+        batch (list[np.ndarray]): The (N,3) points of each request
+        engine (str, optional): The engine in engines.ENGINES. Defaults to 'random'.
+        dcel (str, optional): The DCEL in engines.DCELS. Defaults to 'object'.
+        prefilter (bool, optional): Passed to the engine. Defaults to False.
+
+    Returns:
+        list: for each request the mesh of export_mesh, or a str describing why it failed
+    """
+    results = []
+    for points in batch:
+        try:
+            results.append(ENGINES[engine](points, dcel=DCELS[dcel], prefilter=prefilter).export_mesh())
+        except ValueError as error: ## one bad request doesn't fail the batch
+            results.append(f'{type(error).__name__}: {error}')
+    return results
+
+def latency_percentiles(latencies):
+    """
+    The p50, p90, p99 and max of some latencies
+
+    Args:
+        latencies (Iterable[float]): The latencies in seconds
+
+    Returns:
+        dict: the percentiles in seconds, zero when there are none
+    """
+    latencies = np.fromiter(latencies, dtype=np.float64)
+    if not len(latencies):
+        return {'p50': 0.0, 'p90': 0.0, 'p99': 0.0, 'max': 0.0}
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99]).tolist()
+    return {'p50': p50, 'p90': p90, 'p99': p99, 'max': float(latencies.max())}
+
+class HullClient:
+    """
+    Client of a HullService over one connection. Requests are pipelined, any number of coroutines can await hull on the
+    same client at once and the responses are matched to them by id
+
+        async with HullClient('/tmp/hull.sock') as client:
+            vertices, triangles, indices = await client.hull(points)
+    """
+    def __init__(self, path):
+        """
+        Initializes the client, connect opens the connection
+
+        Args:
+            path (str): The Unix socket of the service
+        """
+        self.path = path
+        self.reader = None
+        self.writer = None
+        self.listener = None ## task reading the responses
+        self.pending = {} ## request id: the future of its response
+        self.ids = itertools.count()
+
+    async def connect(self):
+        """
+        Opens the connection
+        """
+        self.reader, self.writer = await asyncio.open_unix_connection(self.path)
+        self.listener = asyncio.create_task(self.listen())
+
+    async def close(self):
+        """
+        Closes the connection, requests still waiting fail with a ConnectionError
+        """
+        self.writer.close()
+        await self.listener
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def listen(self):
+        """
+        Reads the responses and hands each one to the request waiting for it
+        """
+        try:
+            while True:
+                header = np.frombuffer(await self.reader.readexactly(RESPONSE_HEADER.itemsize), dtype=RESPONSE_HEADER)[0]
+                payload = await self.reader.readexactly(int(header['length']))
+                future = self.pending.pop(int(header['id']), None)
+                if future is not None and not future.done():
+                    future.set_result((header, payload))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError('The hull service closed the connection.'))
+            self.pending.clear()
+
+    async def request(self, kind, points = None, timeout = 0.0):
+        """
+        Sends one request and waits for its response
+
+        Args:
+            kind (int): HULL or STATS
+            points (np.ndarray, optional): The (N,3) points of a HULL request. Defaults to None.
+            timeout (float, optional): Seconds the service gives the request, 0 for its default. Defaults to 0.0.
+
+        Returns:
+            tuple: the response header and payload
+        """
+        request = next(self.ids) & 0xFFFFFFFF
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request] = future
+        body = b'' if points is None else np.ascontiguousarray(points, dtype='<f8').tobytes()
+        header = np.zeros(1, dtype=REQUEST_HEADER)
+        header[0] = (request, kind, 0, timeout, len(body) // 24)
+        self.writer.write(header.tobytes() + body)
+        await self.writer.drain()
+        return await future
+
+    async def hull(self, points, timeout = 0.0):
+        """
+        The hull of some points, built by the service
+
+        Args:
+            points (np.ndarray): The (N,3) points
+            timeout (float, optional): Seconds the service gives the request, 0 for its default. Defaults to 0.0.
+
+        Raises:
+            ValueError: the hull couldn't be built, for example from points all on one line
+            TimeoutError: the service gave up on the request
+
+        Returns:
+            tuple: the same as RandomIncrementalHull3D.export_mesh, the (V,3) hull vertices, the (F,3) vertex rows of each
+            face and the (V,) input index of each hull vertex
+        """
+        header, payload = await self.request(HULL, np.asarray(points).reshape(-1, 3), timeout)
+        if header['status'] == ERROR:
+            raise ValueError(payload.decode())
+        if header['status'] == TIMEOUT:
+            raise TimeoutError(payload.decode())
+        vertices, triangles = int(header['vertices']), int(header['triangles'])
+        return (np.frombuffer(payload, dtype='<f8', count=vertices * 3).reshape(-1, 3),
+                np.frombuffer(payload, dtype='<i4', count=triangles * 3, offset=vertices * 24).reshape(-1, 3),
+                np.frombuffer(payload, dtype='<u4', count=vertices, offset=vertices * 24 + triangles * 12))
+
+    async def stats(self):
+        """
+        The counters and latency percentiles of the service, see HullService.stats
+
+        Returns:
+            dict: the stats
+        """
+        _, payload = await self.request(STATS)
+        return json.loads(payload)
+
+async def load_test(path, requests = 1000, concurrency = 32, connections = 4, sizes = (100, 10000), timeout = 0.0, seed = 0):
+    """
+    Sends requests of random sizes from many coroutines at once and measures the throughput and latency seen by the clients
+
+    Args:
+        path (str): The Unix socket of the service
+        requests (int, optional): The number of requests. Defaults to 1000.
+        concurrency (int, optional): The number of requests in flight at once. Defaults to 32.
+        connections (int, optional): The number of connections the requests are spread over. Defaults to 4.
+        sizes (tuple, optional): The smallest and largest number of points per request, picked log uniformly. Defaults to (100, 10000).
+        timeout (float, optional): Seconds the service gives each request, 0 for its default. Defaults to 0.0.
+        seed (int, optional): The seed of the point sets. Defaults to 0.
+
+    Returns:
+        dict: the requests, failures and timeouts, the seconds taken, the requests and points per second, the p50, p90,
+        p99 and max latency in seconds, and the stats of the service
+    """
+    rng = np.random.default_rng(seed)
+    counts = np.exp(rng.uniform(np.log(sizes[0]), np.log(sizes[1]), requests)).astype(np.intp)
+    samples = [rng.normal(size=(sizes[1], 3)) for _ in range(min(requests, 16))] ## requests are slices of these
+    clients = [HullClient(path) for _ in range(connections)]
+    for client in clients:
+        await client.connect()
+
+    latencies = []
+    failed = timed_out = 0
+    turns = iter(range(requests))
+    async def run(client):
+        nonlocal failed, timed_out
+        for turn in turns:
+            start = time.perf_counter()
+            try:
+                await client.hull(samples[turn % len(samples)][:counts[turn]], timeout)
+                latencies.append(time.perf_counter() - start)
+            except TimeoutError:
+                timed_out += 1
+            except ValueError:
+                failed += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run(clients[i % connections]) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    server = await clients[0].stats()
+    for client in clients:
+        await client.close()
+    return {'requests': requests, 'errors': failed, 'timeouts': timed_out, 'elapsed': elapsed,
+            'requests_per_sec': requests / elapsed, 'points_per_sec': float(counts.sum()) / elapsed,
+            **latency_percentiles(latencies), 'server': server}
@@ -0,0 +1,475 @@
+"""
+Matplotlib plotting for the DCEL and the step by step mode of the hull.
+Kept out of DCEL.py, helpers.py and RandomIncHull.py so building a hull never imports matplotlib,
+the plotting methods there import this module the first time they are called.
+"""
+from matplotlib import animation
+import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from mpl_toolkits.mplot3d.art3d import Line3DCollection, Poly3DCollection
+import numpy as np
+
+import helpers
+from ArrayDCEL import ArrayDCEL
+from RandomIncHull import RandomIncrementalHull3D
+
+def plot_dcel(dcel, normal_mode = False, ax=None, highlight=None, max_faces=None):
+    """
+    method to plot a DCEL in matplotlib
+
+    Args:
+        dcel (DCEL): The DCEL to plot
+        normal_mode (bool, optional): A boolean flag of whether or not to show the normals of the faces. Defaults to False.
+        ax (Axes3D, optional): The axes to draw on, a new figure is made when None. Defaults to None.
+        highlight (list[Edge], optional): The edges to show in red. Defaults to None.
+        max_faces (int, optional): Draw a coarser hull with about this many faces when the hull has more, see decimate.
+            Defaults to None, every face.
+    """
+    if ax is None:
+        fig = plt.figure()
+        ax = fig.add_subplot(111, projection='3d')
+    vertices, triangles, _ = dcel.to_arrays()
+    if max_faces is not None and len(triangles) > max_faces:
+        vertices, triangles = decimate(vertices, triangles, max_faces)
+    draw_mesh(ax, vertices, triangles, normal_mode, edge_rows(highlight, vertices) if highlight else None)
+    plt.show()
+
+def render_png(dcel, path, normal_mode = False, max_faces=20000, size=(8, 8), dpi=100, elev=None, azim=None):
+    """
+    Renders a DCEL straight to a PNG file without pyplot or an interactive backend, for previews in batch jobs
+
+    Args:
+        dcel (DCEL): The DCEL to render
+        path (str): The file to write
+        normal_mode (bool, optional): A boolean flag of whether or not to show the normals of the faces. Defaults to False.
+        max_faces (int, optional): Render a coarser hull with about this many faces when the hull has more,
+            see decimate, None renders every face. Defaults to 20000.
+        size (tuple, optional): The size of the image in inches. Defaults to (8, 8).
+        dpi (int, optional): Pixels per inch. Defaults to 100.
+        elev (float, optional): The elevation of the camera in degrees, matplotlib's default when None. Defaults to None.
+        azim (float, optional): The azimuth of the camera in degrees, matplotlib's default when None. Defaults to None.
+    """
+    vertices, triangles, _ = dcel.to_arrays()
+    if max_faces is not None and len(triangles) > max_faces:
+        vertices, triangles = decimate(vertices, triangles, max_faces)
+    fig = Figure(figsize=size, dpi=dpi) ## not registered with pyplot, so it is never shown and is freed with the object
+    ax = fig.add_subplot(111, projection='3d')
+    ax.view_init(elev=elev, azim=azim)
+    draw_mesh(ax, vertices, triangles, normal_mode)
+    fig.savefig(path, format='png')
+
+def draw_mesh(ax, vertices, triangles, normal_mode = False, highlight=None):
+    """
+    Draws an indexed triangle mesh with one artist for the vertices, one for the edges and one for the faces,
+    every edge is drawn once even though it has two half edges
+
+    Args:
+        ax (Axes3D): The axes to draw on
+        vertices (np.ndarray): The (V,3) vertex coordinates
+        triangles (np.ndarray): The (F,3) vertex rows of each face
+        normal_mode (bool, optional): A boolean flag of whether or not to show the normals of the faces. Defaults to False.
+        highlight (np.ndarray, optional): The (k,2) vertex rows of the edges to show in red. Defaults to None.
+
+    Returns:
+        dict: the artists, under 'vertices', 'edges', 'faces' and 'normals' when normal_mode is on
+    """
+    corners = vertices[triangles]
+    edges = unique_edges(triangles)
+    colors = np.zeros((len(edges), 4))
+    colors[:, 3] = 1 ## black
+    if highlight is not None and len(highlight):
+        colors[np.isin(_edge_keys(edges, len(vertices)), _edge_keys(np.sort(highlight, axis=1), len(vertices)))] = (1, 0, 0, 1)
+
+    artists = {'vertices': ax.scatter(vertices[:, 0], vertices[:, 1], vertices[:, 2], color='b', s=50 if len(vertices) < 1000 else 2),
+               'edges': Line3DCollection(vertices[edges], colors=colors, linewidths=1),
+               'faces': Poly3DCollection(corners, alpha=.5)}
+    ax.add_collection3d(artists['edges'])
+    ax.add_collection3d(artists['faces'])
+    if normal_mode:
+        normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+        centroids = corners.mean(axis=1)
+        length = 0.1 * float(np.ptp(vertices, axis=0).max()) if len(vertices) else 1.0
+        artists['normals'] = ax.quiver(*centroids.T, *normals.T, color='g', length=length, normalize=True)
+
+    ## Set labels and aspect ratio
+    ax.set_xlabel('X')
+    ax.set_ylabel('Y')
+    ax.set_zlabel('Z')
+    ax.set_box_aspect([1, 1, 1])
+    return artists
+
+def decimate(vertices, triangles, max_faces, seed=0):
+    """
+    A coarser hull for previews: the hull of a random sample of the vertices, a closed hull with F faces has
+    F / 2 + 2 vertices so max_faces / 2 + 2 of them are kept. Every vertex of the sample is on the full hull,
+    so the preview is inside it and looks the same at a glance
+
+    Args:
+        vertices (np.ndarray): The (V,3) vertex coordinates of the hull
+        triangles (np.ndarray): The (F,3) vertex rows of each face
+        max_faces (int): About how many faces to keep
+        seed (int, optional): The seed of the sample, so the same hull always decimates the same way. Defaults to 0.
+
+    Returns:
+        tuple: the (V',3) vertex coordinates and the (F',3) faces of the coarser hull
+    """
+    used = np.unique(triangles)
+    keep = max(max_faces // 2 + 2, 4)
+    if len(used) <= keep:
+        return vertices, triangles
+    sample = np.random.default_rng(seed).choice(used, size=keep, replace=False)
+    coarse, faces, _ = RandomIncrementalHull3D(vertices[sample], dcel=ArrayDCEL, seed=seed).export_mesh()
+    return coarse, faces
+
+def unique_edges(triangles):
+    """
+    The edges of a triangle mesh, once each
+
+    Args:
+        triangles (np.ndarray): The (F,3) vertex rows of each face
+
+    Returns:
+        np.ndarray: the (E,2) vertex rows of each edge, the smaller row first
+    """
+    edges = np.sort(np.stack((triangles, np.roll(triangles, -1, axis=1)), axis=2).reshape(-1, 2), axis=1)
+    return np.unique(edges, axis=0)
+
+def edge_rows(edges, vertices):
+    """
+    The vertex rows of DCEL edges in a mesh from DCEL.to_arrays, matched by coordinates so it also works on a
+    decimated mesh, edges whose ends are not in the mesh are left out
+
+    Args:
+        edges (list[Edge]): The edges
+        vertices (np.ndarray): The (V,3) vertex coordinates of the mesh
+
+    Returns:
+        np.ndarray: the (k,2) vertex rows of the edges
+    """
+    rows = {point: i for i, point in enumerate(map(tuple, vertices.tolist()))}
+    pairs = [(rows.get(tuple(edge.start.coordinates)), rows.get(tuple(edge.end.coordinates))) for edge in edges]
+    return np.array([pair for pair in pairs if None not in pair], dtype=np.intp).reshape(-1, 2)
+
+def _edge_keys(edges, count):
+    """
+    One integer per (smaller row, larger row) edge, for np.isin
+    """
+    return edges[:, 0].astype(np.int64) * count + edges[:, 1]
+
+class HullView:
+    """
+    The artists of a hull being built step by step. The hull tells the view about every face it removes and adds
+    (RandomIncrementalHull3D.view), and the view only touches the artists of those faces: the faces made by one
+    insertion share one Poly3DCollection, which loses faces as they are removed and is dropped once it is empty,
+    so a step costs the size of its horizon instead of a redraw of the whole hull
+    """
+    def __init__(self, ax, hull, frames=None, every=1):
+        """
+        Draws the current hull and starts listening to it
+
+        Args:
+            ax (Axes3D): The axes to draw on
+            hull (RandomIncrementalHull3D): The hull to show
+            frames (AbstractMovieWriter, optional): A writer that grabs a frame on every step, for recordings. Defaults to None.
+            every (int, optional): Only grab a frame every this many insertions. Defaults to 1.
+        """
+        self.ax = ax
+        self.dcel = hull.hull
+        self.frames = frames
+        self.every = every
+        self.steps = 0
+        self.groups = {} ## face: the group of the insertion that made it
+        self.members = {} ## group: {face: corners}
+        self.artists = {} ## group: Poly3DCollection
+        self.next_group = 0
+
+        coords = hull.coords
+        low, high = coords.min(axis=0), coords.max(axis=0)
+        ax.set_xlim(low[0], high[0])
+        ax.set_ylim(low[1], high[1])
+        ax.set_zlim(low[2], high[2])
+        ax.set_xlabel('X')
+        ax.set_ylabel('Y')
+        ax.set_zlabel('Z')
+        ax.set_box_aspect([1, 1, 1])
+        ax.scatter(coords[:, 0], coords[:, 1], coords[:, 2], color='0.6', s=2 if len(coords) > 1000 else 8) ## drawn once
+        self.horizon = Line3DCollection([], colors='r', linewidths=2)
+        ax.add_collection3d(self.horizon, autolim=False) ## empty for now, the limits are set above
+        self.point = ax.scatter([], [], [], color='r', s=50)
+        self.faces_added(list(self.dcel.faces), grab=False)
+
+    def faces_removed(self, faces, horizon, point):
+        """
+        Drops the faces a point can see and shows its horizon, called by get_horizon before the faces are removed
+
+        Args:
+            faces (set): The faces being removed
+            horizon (list[Edge]): The horizon edges
+            point (Vertex): The point being added
+        """
+        changed = set()
+        for face in faces:
+            group = self.groups.pop(face, None)
+            if group is not None:
+                del self.members[group][face]
+                changed.add(group)
+        for group in changed:
+            if self.members[group]:
+                self.artists[group].set_verts(list(self.members[group].values()))
+            else:
+                del self.members[group]
+                self.artists.pop(group).remove()
+        self.show_horizon(horizon, point)
+        if self.frames is not None and self.steps % self.every == 0:
+            self.frames.grab_frame()
+
+    def faces_added(self, faces, grab=True):
+        """
+        Draws the faces made by one insertion as one collection and hides the horizon
+
+        Args:
+            faces (list): The new faces
+            grab (bool, optional): A flag to grab a frame when recording. Defaults to True.
+        """
+        if faces:
+            group = self.next_group
+            self.next_group += 1
+            self.members[group] = {face: [vertex.coordinates for vertex in self.dcel.get_face_vertices(face)] for face in faces}
+            for face in faces:
+                self.groups[face] = group
+            self.artists[group] = Poly3DCollection(list(self.members[group].values()), alpha=.5, edgecolors='k', linewidths=.5)
+            self.ax.add_collection3d(self.artists[group], autolim=False)
+        self.show_horizon([], None)
+        if grab:
+            self.steps += 1
+            if self.frames is not None and self.steps % self.every == 0:
+                self.frames.grab_frame()
+
+    def show_horizon(self, horizon, point):
+        """
+        Shows the horizon edges and the point being added in red, nothing when horizon is empty
+
+        Args:
+            horizon (list[Edge]): The horizon edges
+            point (Vertex): The point being added, or None
+        """
+        self.horizon.set_segments([(edge.start.coordinates, edge.end.coordinates) for edge in horizon])
+        self.point._offsets3d = tuple([value] for value in point.coordinates) if point is not None else ([], [], [])
+
+def start(hull, horizon_pause = 0.5):
+    """
+    Starts the interactive incremental plotting of a hull built with dis_inc=True
+
+    Args:
+        hull (RandomIncrementalHull3D): The hull to step through
+        horizon_pause (float, optional): Seconds to show each horizon for, 0 skips it. Defaults to 0.5.
+    """
+    if not hull.dis_inc:
+        return
+
+    plt.ion()
+    hull.horizon_pause = horizon_pause
+    hull.fig = plt.figure()
+    hull.ax = hull.fig.add_subplot(111, projection='3d')
+    hull.view = HullView(hull.ax, hull)
+    hull.fig.canvas.mpl_connect('key_press_event', hull.on_key_press)
+    hull.fig.canvas.mpl_connect('close_event', hull.on_close)
+    plt.title("Press Space to add next point")
+    plt.show(block=True) 
+
+def record(hull, path, fps=10, every=1, size=(8, 8), dpi=100, elev=None, azim=None):
+    """
+    Builds the rest of a hull made with dis_inc=True offscreen, grabbing a frame when each horizon is found and
+    when its faces are added, and writes them as they come: a GIF with Pillow, an MP4 with ffmpeg, or numbered
+    PNG files for a path with a % pattern. No window or interactive backend is needed, so CI can record failing builds
+
+    Args:
+        hull (RandomIncrementalHull3D): The hull to build, made with dis_inc=True and not started
+        path (str): The file to write, '.gif', '.mp4' or a pattern like 'frames/%04d.png'
+        fps (int, optional): Frames per second of the GIF or MP4. Defaults to 10.
+        every (int, optional): Only grab frames every this many insertions, for long builds. Defaults to 1.
+        size (tuple, optional): The size of the frames in inches. Defaults to (8, 8).
+        dpi (int, optional): Pixels per inch. Defaults to 100.
+        elev (float, optional): The elevation of the camera in degrees, matplotlib's default when None. Defaults to None.
+        azim (float, optional): The azimuth of the camera in degrees, matplotlib's default when None. Defaults to None.
+
+    Raises:
+        ValueError: a path that is not a GIF, an MP4 or a frame pattern
+        RuntimeError: an MP4 without ffmpeg installed
+    """
+    if not hull.dis_inc:
+        return
+    if '%' in path:
+        frames = _FrameFiles()
+    elif path.endswith('.gif'):
+        frames = animation.PillowWriter(fps=fps)
+    elif path.endswith('.mp4'):
+        if not animation.writers.is_available('ffmpeg'):
+            raise RuntimeError("Recording an MP4 needs ffmpeg, record a '.gif' or PNG frames instead.")
+        frames = animation.FFMpegWriter(fps=fps)
+    else:
+        raise ValueError(f"Can't record to {path!r}, use a '.gif', an '.mp4' or a frame pattern like 'frames/%04d.png'.")
+
+    fig = Figure(figsize=size, dpi=dpi) ## not registered with pyplot, so it works headless
+    ax = fig.add_subplot(111, projection='3d')
+    ax.view_init(elev=elev, azim=azim)
+    hull.dis_inc = False ## add_point doesn't pause, the view grabs the frames
+    with frames.saving(fig, path, dpi):
+        hull.view = HullView(ax, hull, frames, every)
+        frames.grab_frame()
+        for point in hull.remaining_points:
+            hull.add_point(point)
+        frames.grab_frame()
+    hull.view = None
+
+class _FrameFiles(animation.AbstractMovieWriter):
+    """
+    Movie writer that saves every frame as its own PNG, path is a pattern like 'frames/%04d.png'
+    """
+    def setup(self, fig, outfile, dpi=None):
+        super().setup(fig, outfile, dpi)
+        self.count = 0
+
+    def grab_frame(self, **savefig_kwargs):
+        self.fig.savefig(self.outfile % self.count, format='png', dpi=self.dpi, **savefig_kwargs)
+        self.count += 1
+
+    def finish(self):
+        pass
+
+def on_close(hull, event):
+    """
+    Handles the close event for the incremental plotting,
+    stops the incremental plotting mode and finishes the hull
+
+    Args:
+        hull (RandomIncrementalHull3D): The hull being stepped through
+        event (CloseEvent): the matplotlib close event
+    """
+    hull.dis_inc = False
+    hull.view = None ## nothing left to draw on
+    plt.ioff()
+    if hull.showing_horizon:
+        hull.showing_horizon = False
+        hull.new_faces.extend(hull.hull.create_cone(hull.current_horizon, hull.current_point))
+
+        hull.get_conflicts(hull.needs_update, hull.new_faces)
+
+        hull.needs_update = []
+        hull.new_faces = []
+
+    try:
+        while True:
+            hull.current_point = next(hull.remaining_points)
+            hull.add_point(hull.current_point)
+    except StopIteration:
+        pass
+
+def on_key_press(hull, event):
+    """
+    Handles the key press event for the incremental plotting,
+    adds the next point to the hull when the space key is pressed
+
+    Args:
+        hull (RandomIncrementalHull3D): The hull being stepped through
+        event (KeyEvent): the matplotlib key press event
+    """
+    if event.key == ' ' and not hull.showing_horizon:
+        try:
+            hull.current_point = next(hull.remaining_points)
+            hull.add_point(hull.current_point)
+            if hull.fig: ## might've closed in the add_point
+                hull.redraw()
+        except StopIteration:
+            plt.close(hull.fig)
+
+def redraw(hull, highlight=None, title=None):
+    """
+    Helper function to redraw the hull with optional highlighting and title, 
+    used for the incremental plotting mode. The view already holds the current faces, so only the title,
+    the highlight and the canvas are updated
+
+    Args:
+        hull (RandomIncrementalHull3D): The hull being stepped through
+        highlight (list[Egde], optional): The edges within the hull to highlight, show in red. Defaults to None.
+        title (String, optional): The title of the plot. Defaults to None.
+    """
+    if title:
+        hull.ax.set_title(title)
+    else:
+        hull.ax.set_title("Press Space to add next point")
+    if highlight is not None:
+        hull.view.show_horizon(highlight, hull.current_point)
+    hull.fig.canvas.draw_idle()
+    hull.fig.canvas.flush_events()
+
+def pause(seconds):
+    """
+    Runs the matplotlib event loop for a while, used to show the horizon in the step by step mode
+
+    Args:
+        seconds (float): how long to pause for
+    """
+    plt.pause(seconds)
+
+##old code to test normals
+def normal_test():
+    # Define the vertices of a polygon (half-plane)
+    # These are the vertices in 2D
+    x = np.array([1, 4, 4, 1])
+    y = np.array([1, 1, 4, 4])
+
+    # assign z value for 3D display
+    z = np.array([1,2,2,1])
+
+    # Create the 3D plot
+    fig = plt.figure()
+    ax = fig.add_subplot(111, projection='3d')
+    #plot the point
+
+
+    #create vectors 
+    q = helpers.Vector(2, 8, -4)  #  absolute position of the point
+    v1 = helpers.Vector(x[1]-x[0], y[1]-y[0], z[1]-z[0]) # vector from point 1 to point 2
+    v2 = helpers.Vector(x[2]-x[0], y[2]-y[0], z[2]-z[0]) # vector from point 1 to point 3
+    ax.scatter(q.x, q.y, q.z, color='b')
+    print(q.x, q.y, q.z)
+
+    # Create the faces of the polygon (which could be a quad or triangle, etc.)
+    verts = [[(x[i], y[i], z[i]) for i in range(len(x))]]
+    #determine if the point is visible
+    visible = helpers.determine_visibility(helpers.Vector(x[0], y[0], z[0]), helpers.Vector(x[1], y[1], z[1]), helpers.Vector(x[2], y[2], z[2]), helpers.Vector(2-x[0],8-y[0],-4-z[0]))
+    print(visible)
+    #display points that form the vectors on the graph and label them
+    ax.text(x[0], y[0], z[0], 'p1', color='y')
+    ax.text(x[1], y[1], z[1], 'p2', color='r')
+    ax.text(x[2], y[2], z[2], 'p3', color='g')
+    ax.scatter(x[0], y[0], z[0], color='y')
+    ax.scatter(x[1], y[1], z[1], color='r')
+    ax.scatter(x[2], y[2], z[2], color='g')
+    ax.scatter(q.x, q.y, q.z, color='b')
+
+    #draw the vectors used 
+    ax.quiver(x[0], y[0], z[0], v1.x, v1.y, v1.z, color='r')
+    ax.quiver(x[0], y[0], z[0], v2.x, v2.y, v2.z, color='r')
+    ax.quiver(x[0], y[0], z[0], q.x-x[0], q.y-y[0], q.z-z[0], color='b')
+
+    #draw the normal vector
+    normal_vector =  helpers.Vector.cross_product(v1, v2)
+    ax.quiver(x[0], y[0], z[0], normal_vector.x, normal_vector.y, normal_vector.z, color='g')
+
+    # Plot the polygon as a 3D object
+    poly3d = Poly3DCollection(verts, alpha=0.25, linewidths=1, edgecolors='r')
+    ax.add_collection3d(poly3d)
+
+    # Set the labels and limits
+    ax.set_xlabel('X')
+    ax.set_ylabel('Y')
+    ax.set_zlabel('Z')
+
+    # Set the limits for the axes
+    ax.set_xlim([0, 5])
+    ax.set_ylim([0, 5])
+    ax.set_zlim([0, 5])
+
+    plt.show()